@@ -0,0 +1,61 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from .renderers import ORJSONRenderer
+
+# Digits map to b'0' and everything else to a space, so a run of 19 or more
+# digits (a possible integer beyond 64 bits) is one substring search away
+_DIGIT_MASK = bytes(ord('0') if chr(code) in '0123456789' else ord(' ') for code in range(256))
+_LONG_DIGIT_RUN = b'0' * 19
+
+# Integers orjson keeps exact
+INT_RANGE = range(-2 ** 63, 2 ** 64)
+
+
+def has_big_int(data, limits=INT_RANGE):
+    """
+    Whether JSON or delimited bytes hold an integer literal outside limits,
+    by default those orjson cannot keep exact
+    """
+    digits = data.translate(_DIGIT_MASK)
+    start = digits.find(_LONG_DIGIT_RUN)
+    while start != -1:
+        end = start + len(_LONG_DIGIT_RUN)
+        while digits[end:end + 1] == b'0':
+            end += 1
+        literal_start = start - 1 if data[start - 1:start] == b'-' else start
+        before = data[literal_start - 1:literal_start] if literal_start else b''
+        # Fraction and exponent digits, or a float's integer part, lose nothing
+        if before not in (b'.', b'e', b'E', b'+') and data[end:end + 1] not in (b'.', b'e', b'E'):
+            if int(data[literal_start:end]) not in limits:
+                return True
+        start = digits.find(_LONG_DIGIT_RUN, end)
+    return False
+
+
+def load_json(data):
+    """
+    Parse JSON bytes with orjson, which turns integers beyond 64 bits into
+    floats; documents holding any are parsed the stock way so they stay
+    exact. Either way NaN/Infinity are rejected, as DRF's parser does.
+    """
+    if has_big_int(data):
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson for large request bodies such as the
+    dataset posted to process-data. orjson reads the UTF-8 bytes directly
+    and rejects NaN/Infinity, matching DRF's strict JSON parsing.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return load_json(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
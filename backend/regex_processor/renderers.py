@@ -0,0 +1,36 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson for large payloads such as uploaded rows.
+    Datetimes and types orjson doesn't know (Decimal, lazy strings, pandas
+    Timestamps) go through DRF's encoder, so output matches the stock
+    renderer. Indented output is left to it as well.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+    _fallback = JSONEncoder().default
+
+    @classmethod
+    def dumps(cls, data):
+        """
+        Serialize data to JSON bytes. orjson refuses integers beyond 64 bits
+        (even with a default), so data holding any is encoded the stock way.
+        """
+        try:
+            return orjson.dumps(data, default=cls._fallback, option=cls.options)
+        except TypeError:
+            return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return self.dumps(data)
@@ -1,9 +1,754 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
 from django.conf import settings
-import json
+from django.core.cache import cache, caches
+import orjson
 import re
 import random
 from collections import Counter
+from difflib import get_close_matches
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+
+# re's parser, for inspecting patterns; Python 3.10 only has the old names
+try:
+    from re import _constants, _parser
+except ImportError:
+    import sre_constants as _constants
+    import sre_parse as _parser
+
+# Possessive repeats (a*+) and atomic groups arrived in Python 3.11
+_POSSESSIVE_REPEAT = getattr(_constants, 'POSSESSIVE_REPEAT', None)
+_ATOMIC_GROUP = getattr(_constants, 'ATOMIC_GROUP', None)
+
+try:
+    from rapidfuzz import fuzz, process as fuzz_process, utils as fuzz_utils
+except ImportError:  # Column suggestions fall back to simple substring matching
+    fuzz_process = None
+
+try:
+    import re2
+except ImportError:  # Patterns prone to backtracking are rejected instead
+    re2 = None
+
+
+# requests doesn't promise a Session is thread-safe, so each worker thread
+# keeps its own and reuses its keep-alive connections across requests
+_http_local = threading.local()
+
+
+def _http_session():
+    """Return this thread's requests.Session, creating it on first use"""
+    session = getattr(_http_local, 'session', None)
+    if session is None:
+        session = _http_local.session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+_ASYNC_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+def _async_http_client():
+    """
+    Create a pooled httpx.AsyncClient. Clients are bound to the event loop
+    they are first used on, so callers own one per loop (e.g. per batch).
+    """
+    return httpx.AsyncClient(limits=_ASYNC_HTTP_LIMITS)
+
+
+def _scan_samples(data_sample):
+    """
+    Classify each distinct sample value once with the combined detector.
+    Returns (type_counts, match_samples): per-type counts weighted by how
+    often each value occurs (including "text" for unmatched items) and the
+    first few distinct values of each detected type.
+    """
+    # Seeded in precedence order so most_common() breaks ties the same way
+    type_counts = Counter({kind: 0 for kind, _, _ in _DETECTORS}, text=0)
+    match_samples = {kind: [] for kind, _, _ in _DETECTORS}
+
+    # Items are already stripped strings (see analyze_column_data). Columns
+    # repeat a lot (statuses, country codes), so only distinct values are
+    # matched; Counter keeps first-seen order for the samples below.
+    frequencies = Counter(data_sample)
+    for item, match in zip(frequencies, map(_COMBINED_DETECTOR_RE.fullmatch, frequencies)):
+        kind = match.lastgroup if match else "text"
+        type_counts[kind] += frequencies[item]
+        if match and len(match_samples[kind]) < _SAMPLE_MATCH_LIMIT:
+            match_samples[kind].append(item)
+
+    return type_counts, match_samples
+
+
+_UNBOUNDED_REPEATS = (_constants.MAX_REPEAT, _constants.MIN_REPEAT)
+_REPEAT_OPS = (*_UNBOUNDED_REPEATS, _POSSESSIVE_REPEAT)
+
+
+def _is_unbounded_repeat(op, av):
+    return op in _UNBOUNDED_REPEATS and av[1] == _constants.MAXREPEAT
+
+
+def _child_patterns(op, av):
+    """The sub-patterns nested directly in one parsed pattern item"""
+    if op in _REPEAT_OPS:
+        return [av[2]]
+    if op is _constants.SUBPATTERN:
+        return [av[-1]]
+    if op is _constants.BRANCH:
+        return av[1]
+    if op in (_constants.ASSERT, _constants.ASSERT_NOT):
+        return [av[1]]
+    if op is _ATOMIC_GROUP:
+        return [av]
+    return []
+
+
+def _has_branch(items):
+    return any(
+        op is _constants.BRANCH or any(map(_has_branch, _child_patterns(op, av)))
+        for op, av in items
+    )
+
+
+def _is_ambiguous(items):
+    """
+    True when a repeat body can match at one position in more than one
+    way: it holds an alternation, e.g. (a|a) or (a|ab), or its width
+    varies, e.g. aa? or a+. Repeating such a body lets one input run be
+    split in exponentially many ways when the overall match fails.
+    Alternatives of single characters, as in (a|b), are parsed into a
+    character set and so don't count.
+    """
+    low, high = items.getwidth()
+    return low != high or _has_branch(items)
+
+
+def _has_ambiguous_repeat(items):
+    """Walk a parsed pattern looking for an unbounded repeat of an ambiguous body"""
+    for op, av in items:
+        if _is_unbounded_repeat(op, av) and _is_ambiguous(av[2]):
+            return True
+        if any(map(_has_ambiguous_repeat, _child_patterns(op, av))):
+            return True
+    return False
+
+
+def _compile_linear_time(pattern):
+    """Compile with RE2's automaton engine, or None if RE2 is unavailable"""
+    if re2 is None:
+        return None
+    options = re2.Options()
+    options.log_errors = False
+    try:
+        return re2.compile(pattern, options)
+    except re2.error:  # Backreferences and lookaround are not supported
+        return None
+
+
+@lru_cache(maxsize=4096)
+def compile_regex(pattern):
+    """
+    Compile a user or LLM supplied regex, memoized across calls.
+    Unbounded repeats of alternations or variable-width bodies, such as
+    (a+)+, (a|a)* or (aa?)*, backtrack catastrophically in re and are
+    compiled with RE2 when it is installed. Everything else stays
+    on re, which is faster per call on short cells and Unicode-aware.
+    Raises re.error for invalid or unsafe patterns (failures are not cached).
+    """
+    if _has_ambiguous_repeat(_parser.parse(pattern)):
+        compiled = _compile_linear_time(pattern)
+        if compiled is None:
+            raise re.error("ambiguous repeat may cause catastrophic backtracking", pattern)
+        return compiled
+    return re.compile(pattern)
+
+
+def validate_replacement(compiled_pattern, replacement):
+    """
+    Raise re.error if replacement is not a valid template for the pattern.
+    Lets callers reject a bad template once instead of on its first match,
+    and checks RE2 patterns with the same rules as re.
+    """
+    _parser.parse_template(replacement, compiled_pattern)
+
+
+@lru_cache(maxsize=4096)
+def literal_text(pattern):
+    """
+    The plain text a pattern matches when it is nothing but literal
+    characters (escapes such as \. included), otherwise None. Matching
+    such a pattern is a substring search, which str methods do faster
+    than the regex engine.
+    """
+    try:
+        items = _parser.parse(pattern)
+    except re.error:
+        return None
+    if items.state.flags & re.IGNORECASE:
+        return None
+    if not all(op is _constants.LITERAL for op, _ in items):
+        return None
+    return ''.join(chr(code) for _, code in items)
+
+
+
+def _literal_runs(items):
+    """
+    Runs of literal characters in a parsed pattern that every match passes
+    through: the sequence itself, groups in it, and repeats of at least one.
+    Alternatives, lookarounds and case-insensitive groups are not looked into.
+    """
+    run = []
+    for op, av in items:
+        if op is _constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            yield ''.join(run)
+            run = []
+        if op is _constants.SUBPATTERN:
+            _, add_flags, _, sub_items = av
+            if not add_flags & re.IGNORECASE:
+                yield from _literal_runs(sub_items)
+        elif op in _REPEAT_OPS and av[0] >= 1:
+            yield from _literal_runs(av[2])
+    if run:
+        yield ''.join(run)
+
+
+@lru_cache(maxsize=4096)
+def required_text(pattern):
+    """
+    The longest literal text every match of a pattern contains (the @ of
+    an email pattern, say), or None. Values without it cannot match, and
+    a substring test rules them out far faster than the regex engine.
+    """
+    try:
+        items = _parser.parse(pattern)
+    except re.error:
+        return None
+    if items.state.flags & re.IGNORECASE:
+        return None
+    return max(_literal_runs(items), key=len, default=None)
+
+
+@lru_cache(maxsize=4096)
+def _is_valid_regex(pattern):
+    """Check whether a pattern compiles, memoized across calls"""
+    try:
+        compile_regex(pattern)
+        return True
+    except re.error:
+        return False
+
+
+def _openai_stream_delta(line):
+    """
+    Parse one server-sent-events line of an OpenAI chat completion stream.
+    Returns (content_delta, done).
+    """
+    if not line.startswith('data:'):
+        return '', False
+
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return '', True
+
+    choices = orjson.loads(data).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or '', False
+
+
+def _has_fenced_regex(content):
+    """
+    Whether a partial response already holds a valid fenced code block.
+    Fenced blocks are the first thing _extract_regex_from_response looks for,
+    so once one is complete the rest of the response cannot change the result.
+    """
+    match = _EXTRACT_PATTERNS[0].search(content)
+    return bool(match) and _is_valid_regex(match.group(1).strip())
+
+
+# Column analysis looks at this many leading items
+_ANALYSIS_SAMPLE_SIZE = 10_000
+
+# Samples at least this large are scanned in a worker process so pattern
+# detection does not hold the GIL against other request threads
+_POOL_MIN_SAMPLES = 2_000
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+
+def _get_cpu_pool():
+    """
+    Lazily start the shared process pool. Workers are spawned rather than
+    forked so they never inherit locks held by the server's threads.
+    """
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _cpu_pool
+
+
+def _discard_cpu_pool(pool):
+    """Stop handing out a broken pool; the next _get_cpu_pool starts a new one"""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is pool:
+            _cpu_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_in_pool(fn, calls):
+    """
+    Run fn(*args) for every args tuple in calls on the shared process pool
+    and return the results in order. A worker that dies (OOM kill, crash)
+    breaks the whole pool, so it is replaced and the calls are retried once
+    on the new one before the error is raised.
+    """
+    for attempt in range(2):
+        pool = _get_cpu_pool()
+        try:
+            futures = [pool.submit(fn, *args) for args in calls]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard_cpu_pool(pool)
+            if attempt:
+                raise
+
+
+def _scan_samples_offloaded(data_sample):
+    """Run _scan_samples, in the process pool when the sample is large"""
+    if len(data_sample) < _POOL_MIN_SAMPLES:
+        return _scan_samples(data_sample)
+    return _run_in_pool(_scan_samples, [(data_sample,)])[0]
+
+
+# process_data splits datasets larger than this across the process pool
+_POOL_MIN_ROWS = 2_000
+
+# apply_regex_to_rows memoizes results when fewer than half of the values
+# in this many leading rows are distinct, for at most _ROW_MEMO_SIZE values
+_ROW_MEMO_SAMPLE = 20_000
+_ROW_MEMO_SIZE = 100_000
+
+
+def apply_regex_to_rows(rows, column, pattern, replacement, apply_to_all_columns=False):
+    """
+    Apply a regex replacement to one column, or to every text column, of a
+    list of row dicts. pattern may be a pattern string or an already
+    compiled pattern (see compile_regex); the replacement must already be
+    validated. Returns (processed_rows, matches_count, affected_rows,
+    affected_columns).
+    """
+    compiled_pattern = compile_regex(pattern) if isinstance(pattern, str) else pattern
+
+    # Literal search text with a plain replacement needs no regex engine:
+    # str.count and str.replace find the same non-overlapping matches
+    literal = literal_text(compiled_pattern.pattern) if '\\' not in replacement else None
+    needle = None
+    if literal:
+        def replace_value(value):
+            count = value.count(literal)
+            return (value.replace(literal, replacement) if count else value), count
+    else:
+        replace_value = partial(compiled_pattern.subn, replacement)
+        # Values missing text that every match needs are left alone unscanned
+        needle = required_text(compiled_pattern.pattern)
+
+    # Columns such as country or status repeat a few values many times.
+    # When the leading rows show that, each distinct value is scanned only
+    # once per call; for mostly-unique columns the memo would cost more
+    # than it saves. It stops growing once full either way.
+    if apply_to_all_columns:
+        sample = [value for row in rows[:_ROW_MEMO_SAMPLE] for value in row.values() if isinstance(value, str)]
+    else:
+        sample = [value for row in rows[:_ROW_MEMO_SAMPLE] if isinstance(value := row.get(column), str)]
+
+    if len(set(sample)) * 2 < len(sample):
+        results = {}
+
+        def subn(value):
+            result = results.get(value)
+            if result is None:
+                result = replace_value(value)
+                if len(results) < _ROW_MEMO_SIZE:
+                    results[value] = result
+            return result
+    else:
+        subn = replace_value
+
+    processed_rows = []
+    matches_count = 0
+    affected_rows = 0
+    affected_columns = []
+
+    # Rows without a change are passed through as-is; only changed rows are copied
+    for row in rows:
+        new_row = row
+
+        if apply_to_all_columns:
+            # Apply to all text columns (requirement behavior)
+            for col_name, col_value in row.items():
+                if col_value and isinstance(col_value, str) and (not needle or needle in col_value):
+                    # One pass replaces and counts the matches
+                    new_value, count = subn(col_value)
+                    if new_value != col_value:
+                        if new_row is row:
+                            new_row = row.copy()
+                        new_row[col_name] = new_value
+                        matches_count += count
+                        if col_name not in affected_columns:
+                            affected_columns.append(col_name)
+        else:
+            # Apply to specific column only
+            # One lookup, and no str() for values that already are strings
+            if (value := row.get(column)):
+                original_value = value if isinstance(value, str) else str(value)
+                if not needle or needle in original_value:
+                    new_value, count = subn(original_value)
+                else:
+                    new_value, count = original_value, 0
+
+                if new_value != original_value:
+                    new_row = row.copy()
+                    new_row[column] = new_value
+                    matches_count += count
+                    if column not in affected_columns:
+                        affected_columns.append(column)
+
+        if new_row is not row:
+            affected_rows += 1
+        processed_rows.append(new_row)
+
+    return processed_rows, matches_count, affected_rows, affected_columns
+
+
+def apply_regex_to_rows_offloaded(rows, column, pattern, replacement, apply_to_all_columns=False):
+    """
+    Run apply_regex_to_rows, split into one contiguous chunk per pool
+    worker when the dataset is large. Chunks are merged back in order, so
+    the result is the same as a single pass.
+    """
+    if len(rows) <= _POOL_MIN_ROWS:
+        return apply_regex_to_rows(rows, column, pattern, replacement, apply_to_all_columns)
+
+    # Workers get the pattern string and compile it through their own cache
+    if not isinstance(pattern, str):
+        pattern = pattern.pattern
+
+    chunk_size = -(-len(rows) // os.cpu_count())
+    chunks = _run_in_pool(apply_regex_to_rows, [
+        (rows[start:start + chunk_size], column, pattern, replacement, apply_to_all_columns)
+        for start in range(0, len(rows), chunk_size)
+    ])
+
+    processed_rows = []
+    matches_count = 0
+    affected_rows = 0
+    affected_columns = []
+    for chunk_rows, chunk_matches, chunk_affected, chunk_columns in chunks:
+        processed_rows.extend(chunk_rows)
+        matches_count += chunk_matches
+        affected_rows += chunk_affected
+        affected_columns.extend(col for col in chunk_columns if col not in affected_columns)
+
+    return processed_rows, matches_count, affected_rows, affected_columns
+
+
+def match_values(values, pattern, replacement=None, start=0):
+    """
+    Search a list of strings for a pattern and, given a replacement,
+    replace its matches. A pattern or replacement template that re rejects
+    is matched as literal text instead. Returns (index, new_value, count)
+    for every value that matched, numbering values from start; find-only
+    calls report the value unchanged with a count of 0.
+    """
+    try:
+        compiled_pattern = compile_regex(pattern)
+        if replacement:
+            validate_replacement(compiled_pattern, replacement)
+    except re.error:
+        compiled_pattern = None
+
+    # As in apply_regex_to_rows, literal text with a plain replacement is
+    # searched with str methods instead of the regex engine
+    literal = None
+    if compiled_pattern is not None and '\\' not in (replacement or ''):
+        literal = literal_text(pattern)
+
+    # Values missing text that every match needs can be skipped unscanned
+    needle = required_text(pattern) if compiled_pattern is not None else None
+
+    matches = []
+    for i, value in enumerate(values, start):
+        if not value or (needle and needle not in value):
+            continue
+        if replacement:
+            if literal:
+                count = value.count(literal)
+                if count > 0:
+                    matches.append((i, value.replace(literal, replacement), count))
+            elif compiled_pattern is not None:
+                new_value, count = compiled_pattern.subn(replacement, value)
+                if count > 0:
+                    matches.append((i, new_value, count))
+            elif pattern in value:
+                matches.append((i, value.replace(pattern, replacement), 1))
+        else:
+            if literal:
+                found = literal in value
+            elif compiled_pattern is not None:
+                found = compiled_pattern.search(value)
+            else:
+                found = pattern in value
+            if found:
+                matches.append((i, value, 0))
+
+    return matches
+
+
+def match_values_offloaded(values, pattern, replacement=None):
+    """Run match_values, split across the process pool when there are many values"""
+    if len(values) <= _POOL_MIN_ROWS:
+        return match_values(values, pattern, replacement)
+
+    chunk_size = -(-len(values) // os.cpu_count())
+    chunks = _run_in_pool(match_values, [
+        (values[start:start + chunk_size], pattern, replacement, start)
+        for start in range(0, len(values), chunk_size)
+    ])
+    return [match for chunk in chunks for match in chunk]
+
+
+def _regex_cache_key(description, context, column_data):
+    """
+    Cache key for an LLM regex result, covering everything the prompt is built from.
+    Only surrounding whitespace is ignored, so a description re-sent with a
+    trailing newline still hits the cache; spacing inside may be part of a
+    literal value ('John  Smith') and is kept.
+    """
+    description = str(description).strip()
+    context = str(context).strip()
+    digest = hashlib.blake2b(f"{description}\0{context}\0".encode(), digest_size=16)
+    if column_data:
+        digest.update(str(len(column_data)).encode())
+        for item in column_data[:_ANALYSIS_SAMPLE_SIZE]:
+            digest.update(b"\0" + str(item).encode())
+    return f"nl2regex:{digest.hexdigest()}"
+
+
+def _analysis_cache_key(column_data, column_name):
+    """Cache key for a column analysis: the name, the length and the sampled items"""
+    key_data = [str(column_name), len(column_data), column_data[:_ANALYSIS_SAMPLE_SIZE]]
+    try:
+        payload = orjson.dumps(key_data, default=str)
+    except TypeError:  # Integers beyond 64 bits
+        payload = json.dumps(key_data, default=str).encode()
+    return f"analysis:{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
+
+
+def _local_cache():
+    """The per-process tier, when one is configured in front of a shared cache"""
+    return caches['local'] if 'local' in settings.CACHES else None
+
+
+def _get_cached(cache_key):
+    local = _local_cache()
+    if local is not None and (cached := local.get(cache_key)) is not None:
+        return cached
+    cached = cache.get(cache_key)
+    if cached is not None and local is not None:
+        local.set(cache_key, cached)
+    return cached
+
+
+def _set_cached(cache_key, result):
+    local = _local_cache()
+    if local is not None:
+        local.set(cache_key, result)
+    cache.set(cache_key, result)
+
+
+async def _aget_cached(cache_key):
+    # The local tier is in memory, so it is read without leaving the loop
+    local = _local_cache()
+    if local is not None and (cached := local.get(cache_key)) is not None:
+        return cached
+    cached = await cache.aget(cache_key)
+    if cached is not None and local is not None:
+        local.set(cache_key, cached)
+    return cached
+
+
+async def _aset_cached(cache_key, result):
+    local = _local_cache()
+    if local is not None:
+        local.set(cache_key, result)
+    await cache.aset(cache_key, result)
+
+
+# Detection and fallback patterns, compiled once at import
+_EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+_PHONE_RE = re.compile(r'(\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})')
+_SIMPLE_PHONE_RE = re.compile(r'\d{3}-?\d{3}-?\d{4}')
+_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{4}')
+_URL_RE = re.compile(r'https?://[^\s]+')
+_NUM_RE = re.compile(r'^\d+(\.\d+)?$')
+_DIGITS_RE = re.compile(r'\d+')
+_WORD_RE = re.compile(r'\b\w+\b')
+_IP_RE = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
+_CC_RE = re.compile(r'\d{4}-?\d{4}-?\d{4}-?\d{4}')
+_ZIP_RE = re.compile(r'\d{5}(-\d{4})?')
+_TIME_RE = re.compile(r'\d{1,2}:\d{2}(:\d{2})?')
+
+# Column value detectors, in precedence order for data type inference
+_DETECTORS = (
+    ('email', _EMAIL_RE, "Email addresses"),
+    ('phone', _PHONE_RE, "Phone numbers"),
+    ('date', _DATE_RE, "Dates (MM/DD/YYYY or MM-DD-YYYY)"),
+    ('url', _URL_RE, "URLs"),
+    ('number', _NUM_RE, "Numbers (integer or decimal)"),
+)
+
+# All detectors as one alternation: the first alternative that matches the
+# whole value wins, and its named group (m.lastgroup) identifies the type
+_COMBINED_DETECTOR_RE = re.compile(
+    '|'.join(f'(?P<{kind}>{compiled.pattern})' for kind, compiled, _ in _DETECTORS)
+)
+
+# Sample values kept per detected pattern (analyze_column_data shows 3)
+_SAMPLE_MATCH_LIMIT = 3
+
+# Natural language query patterns -> filter operator, checked in order
+_QUERY_PATTERNS = tuple(
+    (re.compile(pattern, re.IGNORECASE), operator)
+    for pattern, operator in (
+        # "find/show column_name is/= value"
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+(?:is|=|equals?)\s+([^$]+)', 'equals'),
+
+        # "find column_name contains value"
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+contains?\s+([^$]+)', 'contains'),
+
+        # "find column_name > value" (for numbers)
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s*>\s*([^$]+)', 'greater_than'),
+
+        # "find column_name < value" (for numbers)
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s*<\s*([^$]+)', 'less_than'),
+
+        # "find column_name starts with value"
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+starts?\s+with\s+([^$]+)', 'starts_with'),
+
+        # "find column_name ends with value"
+        (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+ends?\s+with\s+([^$]+)', 'ends_with'),
+    )
+)
+
+# Where LLM responses put the regex, in order of preference
+_EXTRACT_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'```(?:regex|re)?\s*\n?([^`]+)\n?```',  # Code blocks
+        r'`([^`]+)`',  # Inline code
+        r'/([^/]+)/',  # Slash notation
+        r'Pattern:\s*([^\n]+)',  # After "Pattern:"
+        r'Regex:\s*([^\n]+)',  # After "Regex:"
+    )
+)
+
+# Response lines starting with these are prose, not a bare pattern
+_PROSE_PREFIXES = ('The', 'This', 'A ', 'An ', 'Here')
+
+# Specific values (emails, phones, URLs) that should be matched literally
+_SPECIFIC_VALUE_PATTERNS = (_EMAIL_RE, _SIMPLE_PHONE_RE, _URL_RE)
+
+# Phrases asking for an exact/literal match
+_EXACT_INDICATORS = (
+    'find exactly', 'match exactly', 'find specific', 'match specific',
+    'find only', 'match only', 'is exactly', '= ', '==', 'equals'
+)
+
+# OpenAI prompt text. Messages are laid out static text first, request
+# data last, so calls with the same intent share an identical prefix that
+# providers with prompt caching can reuse.
+_LITERAL_SYSTEM_MESSAGE = """You are an expert in regular expressions.
+
+IMPORTANT: The user wants to match a SPECIFIC VALUE, not a general pattern.
+
+If the user provides a specific value (like an email address, phone number, or exact text), create a LITERAL match pattern that matches only that exact value.
+
+Rules:
+1. For specific emails like "josh@qq.com", return: josh@qq\.com
+2. For specific phones like "123-456-7890", return: 123-456-7890
+3. For exact text like "John Smith", return: John Smith
+4. Escape special regex characters in literal values (. becomes \.)
+5. Do not create general patterns unless explicitly asked for "all" or "any"
+
+Return only the regex pattern."""
+
+_GENERAL_SYSTEM_MESSAGE = (
+    "You are an expert in regular expressions. Create general patterns that match the described type of data."
+    "\n\nReturn a valid regex pattern and explain it briefly."
+)
+
+_DATA_TYPE_GUIDANCE = {
+    'email': "The data appears to be email addresses. Create a comprehensive email matching pattern.",
+    'phone': "The data appears to be phone numbers. Create a flexible phone number pattern.",
+    'number': "The data appears to be numbers. Create an appropriate numeric pattern.",
+}
+
+_PROMPT_REQUIREMENTS = """Requirements:
+- Return a valid regex pattern
+- Make it precise but not overly restrictive
+- Consider edge cases and variations
+- Explain the pattern briefly
+"""
+
+# Keyword -> general pattern, checked in order
+_FALLBACK_PATTERNS = (
+    ('email', _EMAIL_RE),
+    ('phone', _SIMPLE_PHONE_RE),
+    ('date', _DATE_RE),
+    ('url', _URL_RE),
+    ('number', _DIGITS_RE),
+    ('word', _WORD_RE),
+    ('ip', _IP_RE),
+    ('credit card', _CC_RE),
+    ('zip', _ZIP_RE),
+    ('time', _TIME_RE),
+)
+
+# Single-pass keyword scan: the lookahead reports every (possibly overlapping)
+# keyword occurrence, and the lookup maps it back to its priority and pattern
+_FALLBACK_KEYWORD_RE = re.compile(
+    '(?=(%s))' % '|'.join(re.escape(keyword) for keyword, _ in _FALLBACK_PATTERNS)
+)
+_FALLBACK_LOOKUP = {
+    keyword: (priority, compiled)
+    for priority, (keyword, compiled) in enumerate(_FALLBACK_PATTERNS)
+}
+
+# Natural language task parsing: what to find, and what to replace it with
+# (tried in order, quoted values first)
+_TASK_FIND_RE = re.compile(r'find\s+([^in]+?)(?:\s+in\s+the|\s+from\s+the|\s+in|\s+and)')
+_TASK_REPLACE_RES = tuple(re.compile(pattern) for pattern in (
+    r"replace\s+(?:them\s+)?with\s+['\"]([^'\"]+)['\"]",
+    r"replace\s+(?:them\s+)?with\s+(\w+)",
+    r"replace.*?with\s+['\"]([^'\"]+)['\"]",
+    r"replace.*?with\s+(\w+)",
+))
 
 
 class LLMService:
@@ -22,9 +767,15 @@ class LLMService:
         if not column_data:
             return {"patterns": [], "insights": [], "data_type": "unknown"}
 
-        # Sample the data for analysis (limit to first 100 items for performance)
-        sample_data = column_data[:100] if len(column_data) > 100 else column_data
-        non_empty_data = [str(item).strip() for item in sample_data if item and str(item).strip()]
+        # Re-analyzing the same column (e.g. repeated UI clicks) reuses the earlier result
+        cache_key = _analysis_cache_key(column_data, column_name)
+        cached = _get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        # Sample the data for analysis (large samples are scanned out of process)
+        sample_data = column_data[:_ANALYSIS_SAMPLE_SIZE]
+        non_empty_data = [stripped for item in sample_data if item and (stripped := str(item).strip())]
 
         if not non_empty_data:
             return {"patterns": [], "insights": [], "data_type": "empty"}
@@ -43,8 +794,9 @@ class LLMService:
         if empty_count > 0:
             insights.append(f"{empty_count} empty/null values found ({empty_count/total_count*100:.1f}%)")
 
-        # Pattern detection
-        patterns = self._detect_patterns(non_empty_data)
+        # Pattern detection and type inference share one scan of the sample
+        scan = _scan_samples_offloaded(non_empty_data)
+        patterns = self._detect_patterns(non_empty_data, scan)
 
         for pattern_info in patterns:
             suggested_patterns.append({
@@ -55,19 +807,27 @@ class LLMService:
             })
 
         # Data type inference
-        data_type = self._infer_data_type(non_empty_data)
+        data_type = self._infer_data_type(non_empty_data, scan)
 
-        return {
+        analysis = {
             "patterns": suggested_patterns,
             "insights": insights,
             "data_type": data_type,
             "sample_values": non_empty_data[:5]
         }
+        _set_cached(cache_key, analysis)
+        return analysis
 
     def natural_language_to_regex(self, description, context="", column_data=None):
         """
         Convert natural language description to regex pattern with enhanced intelligence
         """
+        # Identical prompts give the same answer, so reuse earlier LLM results
+        cache_key = _regex_cache_key(description, context, column_data)
+        cached = _get_cached(cache_key)
+        if cached is not None:
+            return cached
+
         # Analyze column data if provided for better context
         column_analysis = None
         if column_data:
@@ -77,16 +837,85 @@ class LLMService:
         if self.openai_api_key:
             openai_result = self._try_openai_regex(description, context, column_analysis)
             if openai_result["success"]:
+                _set_cached(cache_key, openai_result)
                 return openai_result
 
         # Fall back to enhanced Hugging Face approach
         hf_result = self._try_huggingface_regex(description, context, column_analysis)
         if hf_result["success"]:
+            _set_cached(cache_key, hf_result)
             return hf_result
 
         # Finally fall back to predefined patterns
         return self._get_fallback_pattern(description)
 
+    async def natural_language_to_regex_async(self, description, context="", column_data=None, client=None):
+        """
+        Async variant of natural_language_to_regex for use from an event loop.
+        Pass an httpx.AsyncClient to share its connection pool across calls.
+        """
+        if client is None:
+            async with _async_http_client() as client:
+                return await self.natural_language_to_regex_async(description, context, column_data, client)
+
+        cache_key = _regex_cache_key(description, context, column_data)
+        cached = await _aget_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        column_analysis = None
+        if column_data:
+            column_analysis = self.analyze_column_data(column_data, "target_column")
+
+        if self.openai_api_key:
+            openai_result = await self._try_openai_regex_async(client, description, context, column_analysis)
+            if openai_result["success"]:
+                await _aset_cached(cache_key, openai_result)
+                return openai_result
+
+        hf_result = await self._try_huggingface_regex_async(client, description, context, column_analysis)
+        if hf_result["success"]:
+            await _aset_cached(cache_key, hf_result)
+            return hf_result
+
+        return self._get_fallback_pattern(description)
+
+    async def natural_language_to_regex_batch(self, items):
+        """
+        Convert several {description, context, column_data} items concurrently
+        over one pooled client. Results are returned in input order.
+        """
+        # Items that would build the same prompt share one conversion; run
+        # concurrently, they would all miss the cache and each call the LLM
+        keys = [
+            _regex_cache_key(item.get('description', ''), item.get('context', ''), item.get('column_data'))
+            for item in items
+        ]
+        unique_items = {}
+        for key, item in zip(keys, items):
+            unique_items.setdefault(key, item)
+
+        async with _async_http_client() as client:
+            results = await asyncio.gather(
+                *(
+                    self.natural_language_to_regex_async(
+                        item.get('description', ''),
+                        item.get('context', ''),
+                        item.get('column_data'),
+                        client
+                    )
+                    for item in unique_items.values()
+                ),
+                return_exceptions=True
+            )
+        results_by_key = dict(zip(unique_items, results))
+
+        # A failed item falls back to predefined patterns like the serial path would
+        return [
+            self._get_fallback_pattern(item.get('description', '')) if isinstance(result, Exception) else result
+            for item, result in zip(items, map(results_by_key.get, keys))
+        ]
+
     def _try_openai_regex(self, description, context="", column_analysis=None):
         """
         Use OpenAI for intelligent regex generation
@@ -94,6 +923,58 @@ class LLMService:
         if not self.openai_api_key:
             return {"success": False}
 
+        headers, payload = self._build_openai_request(description, context, column_analysis)
+
+        try:
+            response = _http_session().post(self.openai_api_url, headers=headers, json=payload, timeout=10, stream=True)
+
+            with response:
+                if response.status_code != 200:
+                    return {"success": False}
+
+                parts = []
+                for line in response.iter_lines():
+                    delta, done = _openai_stream_delta(line.decode('utf-8'))
+                    parts.append(delta)
+                    # Stop reading as soon as a complete pattern has arrived
+                    if done or ('`' in delta and _has_fenced_regex(''.join(parts))):
+                        break
+
+            return self._parse_openai_response(''.join(parts), description)
+
+        except Exception as e:
+            return {"success": False}
+
+    async def _try_openai_regex_async(self, client, description, context="", column_analysis=None):
+        """
+        Async variant of _try_openai_regex using the given httpx.AsyncClient
+        """
+        if not self.openai_api_key:
+            return {"success": False}
+
+        headers, payload = self._build_openai_request(description, context, column_analysis)
+
+        try:
+            async with client.stream("POST", self.openai_api_url, headers=headers, json=payload, timeout=10) as response:
+                if response.status_code != 200:
+                    return {"success": False}
+
+                parts = []
+                async for line in response.aiter_lines():
+                    delta, done = _openai_stream_delta(line)
+                    parts.append(delta)
+                    if done or ('`' in delta and _has_fenced_regex(''.join(parts))):
+                        break
+
+            return self._parse_openai_response(''.join(parts), description)
+
+        except Exception:
+            return {"success": False}
+
+    def _build_openai_request(self, description, context="", column_analysis=None):
+        """
+        Build headers and payload for an OpenAI chat completion request
+        """
         # Build intelligent prompt with context
         prompt = self._build_intelligent_prompt(description, context, column_analysis)
 
@@ -112,40 +993,76 @@ class LLMService:
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.1,
-            "max_tokens": 200
+            "max_tokens": 200,
+            "stream": True
         }
 
-        try:
-            response = requests.post(self.openai_api_url, headers=headers, json=payload, timeout=10)
+        return headers, payload
 
-            if response.status_code == 200:
-                result = response.json()
-                content = result["choices"][0]["message"]["content"].strip()
+    def _parse_openai_response(self, content, description):
+        """
+        Turn streamed OpenAI completion text into a regex result
+        """
+        content = content.strip()
 
-                # Extract regex pattern from response
-                pattern = self._extract_regex_from_response(content)
+        # Extract regex pattern from response
+        pattern = self._extract_regex_from_response(content)
 
-                if pattern and self._validate_regex(pattern):
-                    return {
-                        "success": True,
-                        "pattern": pattern,
-                        "description": description,
-                        "explanation": content,
-                        "source": "openai"
-                    }
+        if pattern and self._validate_regex(pattern):
+            return {
+                "success": True,
+                "pattern": pattern,
+                "description": description,
+                "explanation": content,
+                "source": "openai"
+            }
+
+        return {"success": False}
 
+    def _try_huggingface_regex(self, description, context="", column_analysis=None):
+        """
+        Enhanced Hugging Face approach with better prompting
+        """
+        if not self.hf_api_key:
             return {"success": False}
 
-        except Exception as e:
+        headers, payload = self._build_huggingface_request(description, context)
+
+        try:
+            response = _http_session().post(self.hf_api_url, headers=headers, json=payload, timeout=15)
+
+            if response.status_code == 200:
+                return self._parse_huggingface_response(response.json(), description)
+
             return {"success": False}
 
-    def _try_huggingface_regex(self, description, context="", column_analysis=None):
+        except Exception:
+            return {"success": False}
+
+    async def _try_huggingface_regex_async(self, client, description, context="", column_analysis=None):
         """
-        Enhanced Hugging Face approach with better prompting
+        Async variant of _try_huggingface_regex using the given httpx.AsyncClient
         """
         if not self.hf_api_key:
             return {"success": False}
 
+        headers, payload = self._build_huggingface_request(description, context)
+
+        try:
+            response = await client.post(self.hf_api_url, headers=headers, json=payload, timeout=15)
+
+            if response.status_code == 200:
+                return self._parse_huggingface_response(response.json(), description)
+
+            return {"success": False}
+
+        except Exception:
+            return {"success": False}
+
+    def _build_huggingface_request(self, description, context=""):
+        """
+        Build headers and payload for a Hugging Face inference request
+        """
         # Build enhanced prompt
         prompt = f"""
 Task: Generate a regular expression pattern.
@@ -174,29 +1091,27 @@ Regex pattern:"""
             }
         }
 
-        try:
-            response = requests.post(self.hf_api_url, headers=headers, json=payload, timeout=15)
+        return headers, payload
 
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    generated_text = result[0].get('generated_text', '').strip()
-
-                    # Clean and extract pattern
-                    pattern = self._extract_regex_from_response(generated_text)
+    def _parse_huggingface_response(self, result, description):
+        """
+        Turn a Hugging Face inference response into a regex result
+        """
+        if isinstance(result, list) and len(result) > 0:
+            generated_text = result[0].get('generated_text', '').strip()
 
-                    if pattern and self._validate_regex(pattern):
-                        return {
-                            "success": True,
-                            "pattern": pattern,
-                            "description": description,
-                            "source": "huggingface"
-                        }
+            # Clean and extract pattern
+            pattern = self._extract_regex_from_response(generated_text)
 
-            return {"success": False}
+            if pattern and self._validate_regex(pattern):
+                return {
+                    "success": True,
+                    "pattern": pattern,
+                    "description": description,
+                    "source": "huggingface"
+                }
 
-        except Exception:
-            return {"success": False}
+        return {"success": False}
 
     def _get_fallback_pattern(self, description):
         """
@@ -206,18 +1121,11 @@ Regex pattern:"""
         description_lower = description.lower()
 
         # First check if description contains specific values that should be matched literally
-        specific_patterns = [
-            r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',  # email
-            r'\d{3}-?\d{3}-?\d{4}',  # phone
-            r'https?://[^\s]+',  # URL
-        ]
-
-        # Check for specific values in the description
-        for pattern in specific_patterns:
-            matches = re.findall(pattern, description)
-            if matches:
+        for compiled in _SPECIFIC_VALUE_PATTERNS:
+            match = compiled.search(description)
+            if match:
                 # User provided a specific value, create literal match
-                specific_value = matches[0]
+                specific_value = match.group(0)
                 # For literal matching, return the unescaped value to avoid JSON escaping issues
                 # The regex engine will still handle it correctly
                 return {
@@ -228,28 +1136,18 @@ Regex pattern:"""
                     "explanation": f"Literal match for specific value: {specific_value}"
                 }
 
-        # Default general patterns
-        patterns = {
-            'email': r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',
-            'phone': r'\d{3}-?\d{3}-?\d{4}',
-            'date': r'\d{1,2}[/-]\d{1,2}[/-]\d{4}',
-            'url': r'https?://[^\s]+',
-            'number': r'\d+',
-            'word': r'\b\w+\b',
-            'ip': r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}',
-            'credit card': r'\d{4}-?\d{4}-?\d{4}-?\d{4}',
-            'zip': r'\d{5}(-\d{4})?',
-            'time': r'\d{1,2}:\d{2}(:\d{2})?',
-        }
-
-        for keyword, pattern in patterns.items():
-            if keyword in description_lower:
-                return {
-                    "success": True,
-                    "pattern": pattern,
-                    "description": description,
-                    "source": "fallback"
-                }
+        # Default general patterns, highest-priority keyword wins
+        best = min(
+            (_FALLBACK_LOOKUP[m.group(1)] for m in _FALLBACK_KEYWORD_RE.finditer(description_lower)),
+            default=None
+        )
+        if best is not None:
+            return {
+                "success": True,
+                "pattern": best[1].pattern,
+                "description": description,
+                "source": "fallback"
+            }
 
         # Default pattern for any non-whitespace sequence
         return {
@@ -259,111 +1157,50 @@ Regex pattern:"""
             "source": "fallback"
         }
 
-    def _detect_patterns(self, data_sample):
+    def _detect_patterns(self, data_sample, scan=None):
         """
         Detect common patterns in data sample
         """
-        patterns = []
-
-        # Email detection
-        email_regex = r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'
-        email_matches = [item for item in data_sample if re.match(email_regex, str(item))]
-        if email_matches:
-            patterns.append({
-                "regex": email_regex,
-                "description": "Email addresses",
-                "confidence": len(email_matches) / len(data_sample),
-                "samples": email_matches
-            })
+        if scan is None:
+            scan = _scan_samples(data_sample)
+        type_counts, match_samples = scan
 
-        # Phone number detection
-        phone_regex = r'(\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})'
-        phone_matches = [item for item in data_sample if re.match(phone_regex, str(item))]
-        if phone_matches:
-            patterns.append({
-                "regex": phone_regex,
-                "description": "Phone numbers",
-                "confidence": len(phone_matches) / len(data_sample),
-                "samples": phone_matches
-            })
-
-        # Date detection
-        date_regex = r'\d{1,2}[/-]\d{1,2}[/-]\d{4}'
-        date_matches = [item for item in data_sample if re.match(date_regex, str(item))]
-        if date_matches:
-            patterns.append({
-                "regex": date_regex,
-                "description": "Dates (MM/DD/YYYY or MM-DD-YYYY)",
-                "confidence": len(date_matches) / len(data_sample),
-                "samples": date_matches
-            })
-
-        # URL detection
-        url_regex = r'https?://[^\s]+'
-        url_matches = [item for item in data_sample if re.match(url_regex, str(item))]
-        if url_matches:
-            patterns.append({
-                "regex": url_regex,
-                "description": "URLs",
-                "confidence": len(url_matches) / len(data_sample),
-                "samples": url_matches
-            })
+        patterns = []
 
-        # Number detection
-        number_regex = r'^\d+(\.\d+)?$'
-        number_matches = [item for item in data_sample if re.match(number_regex, str(item))]
-        if number_matches:
-            patterns.append({
-                "regex": number_regex,
-                "description": "Numbers (integer or decimal)",
-                "confidence": len(number_matches) / len(data_sample),
-                "samples": number_matches
-            })
+        for kind, compiled, description in _DETECTORS:
+            if type_counts[kind]:
+                patterns.append({
+                    "regex": compiled.pattern,
+                    "description": description,
+                    "confidence": type_counts[kind] / len(data_sample),
+                    "samples": match_samples[kind]
+                })
 
         # Sort by confidence
         patterns.sort(key=lambda x: x["confidence"], reverse=True)
         return patterns[:5]  # Return top 5 patterns
 
-    def _infer_data_type(self, data_sample):
+    def _infer_data_type(self, data_sample, scan=None):
         """
         Infer the primary data type of the column
         """
         if not data_sample:
             return "unknown"
 
-        # Count different types
-        type_counts = {
-            "email": 0,
-            "phone": 0,
-            "date": 0,
-            "url": 0,
-            "number": 0,
-            "text": 0
-        }
-
-        for item in data_sample:
-            item_str = str(item)
-            if re.match(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}', item_str):
-                type_counts["email"] += 1
-            elif re.match(r'(\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})', item_str):
-                type_counts["phone"] += 1
-            elif re.match(r'\d{1,2}[/-]\d{1,2}[/-]\d{4}', item_str):
-                type_counts["date"] += 1
-            elif re.match(r'https?://[^\s]+', item_str):
-                type_counts["url"] += 1
-            elif re.match(r'^\d+(\.\d+)?$', item_str):
-                type_counts["number"] += 1
-            else:
-                type_counts["text"] += 1
+        if scan is None:
+            scan = _scan_samples(data_sample)
+        type_counts = scan[0]
 
         # Return the most common type
-        return max(type_counts.keys(), key=lambda k: type_counts[k])
+        return type_counts.most_common(1)[0][0]
 
     def _build_intelligent_prompt(self, description, context="", column_analysis=None):
         """
-        Build an intelligent prompt with context and data analysis
+        Build an intelligent prompt with context and data analysis.
+        The fixed requirements lead so the request data is the only varying part.
         """
-        prompt = f"Generate a regular expression pattern for: {description}\n"
+        prompt = _PROMPT_REQUIREMENTS
+        prompt += f"\nGenerate a regular expression pattern for: {description}\n"
 
         if context:
             prompt += f"Additional context: {context}\n"
@@ -376,12 +1213,6 @@ Regex pattern:"""
             if column_analysis['insights']:
                 prompt += f"- Insights: {'; '.join(column_analysis['insights'])}\n"
 
-        prompt += "\nRequirements:\n"
-        prompt += "- Return a valid regex pattern\n"
-        prompt += "- Make it precise but not overly restrictive\n"
-        prompt += "- Consider edge cases and variations\n"
-        prompt += "- Explain the pattern briefly\n"
-
         return prompt
 
     def _extract_regex_from_response(self, response_text):
@@ -389,16 +1220,8 @@ Regex pattern:"""
         Extract regex pattern from LLM response
         """
         # Look for patterns in code blocks or between slashes
-        patterns = [
-            r'```(?:regex|re)?\s*\n?([^`]+)\n?```',  # Code blocks
-            r'`([^`]+)`',  # Inline code
-            r'/([^/]+)/',  # Slash notation
-            r'Pattern:\s*([^\n]+)',  # After "Pattern:"
-            r'Regex:\s*([^\n]+)',  # After "Regex:"
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, response_text, re.IGNORECASE)
+        for compiled in _EXTRACT_PATTERNS:
+            match = compiled.search(response_text)
             if match:
                 potential_regex = match.group(1).strip()
                 if self._validate_regex(potential_regex):
@@ -408,7 +1231,7 @@ Regex pattern:"""
         lines = response_text.split('\n')
         for line in lines:
             line = line.strip()
-            if line and not line.startswith(('The', 'This', 'A ', 'An ', 'Here')):
+            if line and not line.startswith(_PROSE_PREFIXES):
                 if self._validate_regex(line):
                     return line
 
@@ -418,11 +1241,7 @@ Regex pattern:"""
         """
         Validate if a string is a valid regex pattern
         """
-        try:
-            re.compile(pattern)
-            return True
-        except re.error:
-            return False
+        return _is_valid_regex(pattern)
 
     def test_regex_on_sample(self, pattern, sample_data, replacement="[MATCH]"):
         """
@@ -433,18 +1252,18 @@ Regex pattern:"""
 
         try:
             # Compile the pattern
-            compiled_pattern = re.compile(pattern)
+            compiled_pattern = compile_regex(pattern)
 
             results = []
             match_count = 0
 
             for item in sample_data[:10]:  # Test on first 10 items
                 item_str = str(item)
-                matches = compiled_pattern.findall(item_str)
-                replaced = re.sub(pattern, replacement, item_str)
+                # One pass replaces and counts; only collect matches when there are some
+                replaced, count = compiled_pattern.subn(replacement, item_str)
+                matches = compiled_pattern.findall(item_str) if count else []
 
-                if matches:
-                    match_count += len(matches)
+                match_count += count
 
                 results.append({
                     "original": item_str,
@@ -475,7 +1294,9 @@ Regex pattern:"""
             return {"success": False, "error": "No data available for querying"}
 
         # Validate and parse the query
-        parsed_query = self._parse_natural_query(query, columns)
+        # Case-insensitive column lookups share one index per query
+        col_index = self._build_column_index(columns)
+        parsed_query = self._parse_natural_query(query, columns, col_index)
 
         if not parsed_query["success"]:
             return parsed_query
@@ -496,11 +1317,14 @@ Regex pattern:"""
         except Exception as e:
             return {"success": False, "error": f"Query execution error: {str(e)}"}
 
-    def _parse_natural_query(self, query, columns):
+    def _parse_natural_query(self, query, columns, col_index=None):
         """
         Parse natural language query and validate column existence
         """
-        query_lower = query.lower().strip()
+        if col_index is None:
+            col_index = self._build_column_index(columns)
+
+        query = query.strip()
 
         # Initialize query structure
         parsed = {
@@ -512,36 +1336,15 @@ Regex pattern:"""
             "errors": []
         }
 
-        # Check for basic query patterns
-        query_patterns = [
-            # "find/show column_name is/= value"
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+(?:is|=|equals?)\s+([^$]+)', 'equals'),
-
-            # "find column_name contains value"
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+contains?\s+([^$]+)', 'contains'),
-
-            # "find column_name > value" (for numbers)
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s*>\s*([^$]+)', 'greater_than'),
-
-            # "find column_name < value" (for numbers)
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s*<\s*([^$]+)', 'less_than'),
-
-            # "find column_name starts with value"
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+starts?\s+with\s+([^$]+)', 'starts_with'),
-
-            # "find column_name ends with value"
-            (r'(?:find|show|get)\s+(?:all\s+)?(?:users?|records?|rows?)?\s*(?:where\s+)?(\w+)\s+ends?\s+with\s+([^$]+)', 'ends_with'),
-        ]
-
         # Try to match query patterns
-        for pattern, operator in query_patterns:
-            match = re.search(pattern, query_lower)
+        for compiled, operator in _QUERY_PATTERNS:
+            match = compiled.search(query)
             if match:
                 column_name = match.group(1).strip()
                 value = match.group(2).strip().strip('"\'')
 
                 # Validate column exists
-                if not self._validate_column_exists(column_name, columns):
+                if not self._validate_column_exists(column_name, col_index):
                     # Try to find similar column names
                     suggestions = self._suggest_similar_columns(column_name, columns)
                     error_msg = f"Column '{column_name}' not found in data."
@@ -578,21 +1381,33 @@ Regex pattern:"""
             "available_columns": columns
         }
 
-    def _validate_column_exists(self, column_name, columns):
+    def _build_column_index(self, columns):
+        """Map lowercased column names to actual names (first occurrence wins)"""
+        col_index = {}
+        for col in columns:
+            col_index.setdefault(col.lower(), col)
+        return col_index
+
+    def _validate_column_exists(self, column_name, col_index):
         """Check if column exists (case-insensitive)"""
-        column_lower = column_name.lower()
-        return any(col.lower() == column_lower for col in columns)
+        return column_name.lower() in col_index
 
-    def _get_actual_column_name(self, column_name, columns):
+    def _get_actual_column_name(self, column_name, col_index):
         """Get the actual column name with correct case"""
-        column_lower = column_name.lower()
-        for col in columns:
-            if col.lower() == column_lower:
-                return col
-        return None
+        return col_index.get(column_name.lower())
 
     def _suggest_similar_columns(self, column_name, columns, max_suggestions=3):
-        """Suggest similar column names using simple string similarity"""
+        """Suggest similar column names, ranked by fuzzy similarity when rapidfuzz is available"""
+        if fuzz_process is not None:
+            matches = fuzz_process.extract(
+                column_name, columns,
+                scorer=fuzz.WRatio,
+                processor=fuzz_utils.default_process,
+                limit=max_suggestions,
+                score_cutoff=60
+            )
+            return [col for col, _, _ in matches]
+
         suggestions = []
         column_lower = column_name.lower()
 
@@ -612,51 +1427,51 @@ Regex pattern:"""
 
     def _execute_query(self, data, parsed_query):
         """Execute the parsed query on data"""
-        column = self._get_actual_column_name(parsed_query["column"], [row.keys() for row in data if row][0])
+        first_row_keys = next((row.keys() for row in data if row), ())
+        column = self._get_actual_column_name(parsed_query["column"], self._build_column_index(first_row_keys))
         operator = parsed_query["operator"]
         value = parsed_query["value"]
 
-        filtered_results = []
-
-        for row in data:
-            if column not in row:
-                continue
+        if operator in ("greater_than", "less_than"):
+            try:
+                value_num = float(value)
+            except ValueError:
+                # A non-numeric value can never satisfy a numeric comparison
+                return []
 
-            cell_value = str(row[column]).strip()
+            filtered_results = []
 
-            # Apply the filter based on operator
-            match = False
+            for row in data:
+                if column not in row:
+                    continue
 
-            if operator == "equals":
-                match = cell_value.lower() == value.lower()
+                try:
+                    cell_num = float(str(row[column]).strip())
+                except ValueError:
+                    # If can't convert to number, skip this row
+                    continue
 
-            elif operator == "contains":
-                match = value.lower() in cell_value.lower()
+                if cell_num > value_num if operator == "greater_than" else cell_num < value_num:
+                    filtered_results.append(row)
 
-            elif operator == "starts_with":
-                match = cell_value.lower().startswith(value.lower())
+            return filtered_results
 
-            elif operator == "ends_with":
-                match = cell_value.lower().endswith(value.lower())
+        # String operators: dispatch once, then filter in a single comprehension
+        value_lower = value.lower()
 
-            elif operator in ["greater_than", "less_than"]:
-                try:
-                    cell_num = float(cell_value)
-                    value_num = float(value)
+        if operator == "equals":
+            return [row for row in data if column in row and str(row[column]).strip().lower() == value_lower]
 
-                    if operator == "greater_than":
-                        match = cell_num > value_num
-                    else:  # less_than
-                        match = cell_num < value_num
+        if operator == "contains":
+            return [row for row in data if column in row and value_lower in str(row[column]).strip().lower()]
 
-                except ValueError:
-                    # If can't convert to number, skip this row
-                    continue
+        if operator == "starts_with":
+            return [row for row in data if column in row and str(row[column]).strip().lower().startswith(value_lower)]
 
-            if match:
-                filtered_results.append(row)
+        if operator == "ends_with":
+            return [row for row in data if column in row and str(row[column]).strip().lower().endswith(value_lower)]
 
-        return filtered_results
+        return []
 
     def _build_intelligent_system_message(self, description, column_analysis=None):
         """
@@ -664,78 +1479,37 @@ Regex pattern:"""
         """
         description_lower = description.lower()
 
-        # Check if user wants exact/literal matching
-        exact_indicators = [
-            'find exactly', 'match exactly', 'find specific', 'match specific',
-            'find only', 'match only', 'is exactly', '= ', '==', 'equals'
-        ]
-
-        # Check if description contains specific values (emails, phone numbers, etc.)
-        specific_patterns = [
-            r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',  # email
-            r'\d{3}-?\d{3}-?\d{4}',  # phone
-            r'https?://[^\s]+',  # URL
-        ]
-
         # Check for exact match indicators
-        wants_exact_match = any(indicator in description_lower for indicator in exact_indicators)
+        wants_exact_match = any(indicator in description_lower for indicator in _EXACT_INDICATORS)
 
         # Check if description contains specific values
-        contains_specific_value = False
-        specific_value = None
-
-        for pattern in specific_patterns:
-            matches = re.findall(pattern, description)
-            if matches:
-                contains_specific_value = True
-                specific_value = matches[0]
-                break
+        contains_specific_value = any(compiled.search(description) for compiled in _SPECIFIC_VALUE_PATTERNS)
 
         # Build intelligent system message
         if wants_exact_match or (contains_specific_value and not any(word in description_lower for word in ['find all', 'find any', 'match all', 'match any'])):
-            return """You are an expert in regular expressions.
+            return _LITERAL_SYSTEM_MESSAGE
 
-IMPORTANT: The user wants to match a SPECIFIC VALUE, not a general pattern.
-
-If the user provides a specific value (like an email address, phone number, or exact text), create a LITERAL match pattern that matches only that exact value.
-
-Rules:
-1. For specific emails like "josh@qq.com", return: josh@qq\.com
-2. For specific phones like "123-456-7890", return: 123-456-7890
-3. For exact text like "John Smith", return: John Smith
-4. Escape special regex characters in literal values (. becomes \.)
-5. Do not create general patterns unless explicitly asked for "all" or "any"
-
-Return only the regex pattern."""
-
-        else:
-            # General pattern matching
-            base_message = "You are an expert in regular expressions. Create general patterns that match the described type of data."
-
-            # Add context-specific guidance
-            if column_analysis:
-                data_type = column_analysis.get('data_type', 'text')
-                if data_type == 'email':
-                    base_message += "\n\nThe data appears to be email addresses. Create a comprehensive email matching pattern."
-                elif data_type == 'phone':
-                    base_message += "\n\nThe data appears to be phone numbers. Create a flexible phone number pattern."
-                elif data_type == 'number':
-                    base_message += "\n\nThe data appears to be numbers. Create an appropriate numeric pattern."
-
-            base_message += "\n\nReturn a valid regex pattern and explain it briefly."
-            return base_message
+        # General pattern matching, with context-specific guidance after the fixed text
+        guidance = _DATA_TYPE_GUIDANCE.get(column_analysis.get('data_type', 'text')) if column_analysis else None
+        if guidance:
+            return f"{_GENERAL_SYSTEM_MESSAGE}\n\n{guidance}"
+        return _GENERAL_SYSTEM_MESSAGE
 
     def apply_regex_replacement(self, text, pattern, replacement):
         """
-        Apply regex pattern replacement to text
+        Apply regex pattern replacement to text. pattern may be a pattern
+        string or an already compiled pattern (see compile_regex).
         """
         try:
-            result = re.sub(pattern, replacement, text)
+            compiled_pattern = compile_regex(pattern) if isinstance(pattern, str) else pattern
+            # One pass gives both the replaced text and the match count
+            result, count = compiled_pattern.subn(replacement, text)
             return {
                 "success": True,
                 "original": text,
                 "result": result,
-                "pattern": pattern,
+                "matches": count,
+                "pattern": compiled_pattern.pattern,
                 "replacement": replacement
             }
         except re.error as e:
@@ -752,9 +1526,6 @@ Return only the regex pattern."""
         - "Find email addresses in the Email column and replace them with 'REDACTED'"
         - "Find phone numbers in the Contact column"
         """
-        import re
-        from difflib import get_close_matches
-
         task_lower = task_description.lower()
 
         # Extract column name
@@ -789,7 +1560,7 @@ Return only the regex pattern."""
         # If still no column found, suggest closest matches
         if not target_column:
             # Look for potential column words in the task
-            words = re.findall(r'\b\w+\b', task_lower)
+            words = _WORD_RE.findall(task_lower)
             for word in words:
                 matches = get_close_matches(word, [col.lower() for col in columns], n=1, cutoff=0.6)
                 if matches:
@@ -815,20 +1586,13 @@ Return only the regex pattern."""
         replacement_value = None
 
         # Look for "find/replace" patterns
-        find_match = re.search(r'find\s+([^in]+?)(?:\s+in\s+the|\s+from\s+the|\s+in|\s+and)', task_lower)
+        find_match = _TASK_FIND_RE.search(task_lower)
         if find_match:
             pattern_description = find_match.group(1).strip()
 
         # Look for replacement value
-        replace_patterns = [
-            r"replace\s+(?:them\s+)?with\s+['\"]([^'\"]+)['\"]",
-            r"replace\s+(?:them\s+)?with\s+(\w+)",
-            r"replace.*?with\s+['\"]([^'\"]+)['\"]",
-            r"replace.*?with\s+(\w+)"
-        ]
-
-        for pattern in replace_patterns:
-            match = re.search(pattern, task_lower)
+        for replace_re in _TASK_REPLACE_RES:
+            match = replace_re.search(task_lower)
             if match:
                 replacement_value = match.group(1)
                 break
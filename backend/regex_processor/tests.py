@@ -1,3 +1,391 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import re
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+import pandas as pd
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import services, views
+from .parsers import load_json
+from .services import (
+    apply_regex_to_rows,
+    apply_regex_to_rows_offloaded,
+    compile_regex,
+    literal_text,
+    match_values,
+    required_text,
+)
+
+
+def response_json(response):
+    """Decode a JSON response body"""
+    return json.loads(response.content)
+
+
+def break_cpu_pool():
+    """Kill a worker of the shared pool, which breaks the whole pool"""
+    pool = services._get_cpu_pool()
+    try:
+        pool.submit(os._exit, 1).result()
+    except BrokenProcessPool:
+        pass
+    return pool
+
+
+class CompileRegexTests(TestCase):
+    def setUp(self):
+        compile_regex.cache_clear()
+
+    def tearDown(self):
+        compile_regex.cache_clear()
+
+    def test_plain_patterns_use_re(self):
+        for pattern in (r'\d+-\d+', r'(a|b)*c', r'(ab|ac)*', r'(\d{3}-)+', r'[\w.]+@[\w.]+\.[a-z]{2,}'):
+            self.assertIsInstance(compile_regex(pattern), re.Pattern, pattern)
+
+    @skipUnless(services.re2, 'google-re2 is not installed')
+    def test_ambiguous_repeats_use_re2(self):
+        for pattern in (r'(a+)+$', r'(\w+\s?)*$', r'(?:x|(a*)*)+b', r'(a|a)*b', r'(a|b|ab)*c', r'(aa?)*b'):
+            compiled = compile_regex(pattern)
+            self.assertNotIsInstance(compiled, re.Pattern, pattern)
+        # Each would backtrack for minutes in re
+        self.assertIsNone(compile_regex(r'(a+)+$').search('a' * 40 + 'b'))
+        self.assertIsNone(compile_regex(r'(a|a)*b').search('a' * 40 + '!'))
+
+    def test_ambiguous_repeats_rejected_without_re2(self):
+        with mock.patch.object(services, 're2', None):
+            for pattern in (r'(a+)+$', r'(a|a)*b'):
+                with self.assertRaises(re.error):
+                    compile_regex(pattern)
+
+    @skipUnless(services.re2, 'google-re2 is not installed')
+    def test_ambiguous_repeats_re2_cannot_run_are_rejected(self):
+        with self.assertRaises(re.error):
+            compile_regex(r'(?=(a|a)*b)')
+
+    def test_invalid_pattern_raises(self):
+        with self.assertRaises(re.error):
+            compile_regex('(unclosed')
+
+
+class ConvertToRegexBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # No API keys, so conversions use the predefined patterns
+        for name in ('openai_api_key', 'hf_api_key'):
+            patcher = mock.patch.object(views.llm_service, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        return self.client.post(reverse('convert_to_regex_batch'), json.dumps(body), content_type='application/json')
+
+    def test_results_keep_request_order(self):
+        response = self.post([
+            {'description': 'find email'},
+            {'description': ''},
+            'not an item',
+            {'description': 'find email'},
+            {'description': 'phone 555-123-4567'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response_json(response)['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0]['pattern'], r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+        self.assertEqual(results[1], {'success': False, 'error': 'Description is required'})
+        self.assertEqual(results[2], {'success': False, 'error': 'Description is required'})
+        self.assertEqual(results[3], results[0])
+        self.assertEqual(results[4]['pattern'], '555-123-4567')
+
+    def test_rejects_empty_batch(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({'description': 'x'}).status_code, 400)
+
+
+class RegexCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_keys_ignore_only_surrounding_whitespace(self):
+        key = services._regex_cache_key("match exactly 'John Smith'", '', None)
+        self.assertEqual(services._regex_cache_key("  match exactly 'John Smith'\n", ' ', None), key)
+        self.assertNotEqual(services._regex_cache_key("match exactly 'John  Smith'", '', None), key)
+        self.assertNotEqual(services._regex_cache_key("match exactly 'John Smith'", '', ['a']), key)
+
+    def test_inner_spacing_gets_its_own_result(self):
+        def convert(description, context, column_analysis):
+            return {'success': True, 'pattern': re.escape(description[15:-1]), 'description': description}
+
+        service = services.LLMService()
+        service.openai_api_key = 'test'
+        with mock.patch.object(service, '_try_openai_regex', side_effect=convert):
+            for description in ("match exactly 'John  Smith'", "match exactly 'John Smith'"):
+                self.assertEqual(service.natural_language_to_regex(description)['description'], description)
+
+    def test_batch_keeps_items_with_different_spacing_apart(self):
+        async def convert(description, context, column_data, client):
+            return {'success': True, 'description': description}
+
+        service = services.LLMService()
+        items = [{'description': "match exactly 'John  Smith'"}, {'description': "match exactly 'John Smith'"}]
+        with mock.patch.object(service, 'natural_language_to_regex_async', side_effect=convert):
+            results = asyncio.run(service.natural_language_to_regex_batch(items))
+        self.assertEqual([result['description'] for result in results], [item['description'] for item in items])
+
+
+class ProcessPoolTests(TestCase):
+    def test_offloaded_scan_matches_in_process(self):
+        sample = [f'user{i}@example.com' if i % 3 else f'555-01{i % 100:02d}' for i in range(services._POOL_MIN_SAMPLES * 2)]
+        self.assertEqual(services._scan_samples_offloaded(sample), services._scan_samples(sample))
+
+    def test_broken_pool_is_replaced(self):
+        pool = break_cpu_pool()
+        self.assertEqual(services._run_in_pool(pow, [(2, 10), (3, 2)]), [1024, 9])
+        self.assertIsNot(services._get_cpu_pool(), pool)
+
+    def test_repeated_worker_death_is_raised(self):
+        with self.assertRaises(BrokenProcessPool):
+            services._run_in_pool(os._exit, [(1,)])
+        # The pool after that still works
+        self.assertEqual(services._run_in_pool(pow, [(2, 3)]), [8])
+
+    def test_offloaded_rows_match_single_pass(self):
+        rows = [{'c': f'item {i}', 'n': i} for i in range(services._POOL_MIN_ROWS * 2)]
+        self.assertEqual(
+            apply_regex_to_rows_offloaded(rows, 'c', r'\d+', '#'),
+            apply_regex_to_rows(rows, 'c', r'\d+', '#'),
+        )
+
+
+class UploadFileTests(TestCase):
+    def upload(self, name, content):
+        return self.client.post(reverse('upload_file'), {'file': SimpleUploadedFile(name, content)})
+
+    def test_csv(self):
+        response = self.upload('a.csv', b'id,name,score\n1,Ann,1.5\n2,NA,\n3,null,0.30000000000000004\n')
+        self.assertEqual(response.status_code, 200)
+        body = response_json(response)
+        self.assertEqual(body['columns'], ['id', 'name', 'score'])
+        self.assertEqual(body['row_count'], 3)
+        self.assertEqual(body['data'], [
+            {'id': 1, 'name': 'Ann', 'score': 1.5},
+            {'id': 2, 'name': '', 'score': ''},
+            {'id': 3, 'name': '', 'score': 0.30000000000000004},
+        ])
+
+    def test_csv_dates_stay_text(self):
+        body = response_json(self.upload('a.csv', b'day,n\n2024-01-02,1\n'))
+        self.assertEqual(body['data'], [{'day': '2024-01-02', 'n': 1}])
+
+    def test_csv_wide_integers_stay_exact(self):
+        body = response_json(self.upload('a.csv', b'id,name\n12345678901234567890123,a\n1,b\n'))
+        self.assertEqual(body['data'], [
+            {'id': '12345678901234567890123', 'name': 'a'},
+            {'id': '1', 'name': 'b'},
+        ])
+
+    def test_csv_matches_pandas(self):
+        content = b'a,b,c\n1,x/y,\n2,"q, r",3.25\n'
+        expected = pd.read_csv(SimpleUploadedFile('a.csv', content)).fillna('').to_dict('records')
+        self.assertEqual(response_json(self.upload('a.csv', content))['data'], expected)
+
+    def test_tsv(self):
+        body = response_json(self.upload('a.tsv', b'a\tb\n1\tx\n'))
+        self.assertEqual(body['data'], [{'a': 1, 'b': 'x'}])
+
+    def test_txt_table(self):
+        content = b'name;n\nAnn;1\nBob;\n'
+        body = response_json(self.upload('a.txt', content))
+        self.assertEqual(body['display_type'], 'table')
+        self.assertEqual(body['data'], [{'name': 'Ann', 'n': 1}, {'name': 'Bob', 'n': ''}])
+
+    def test_txt_plain_text(self):
+        body = response_json(self.upload('a.txt', b'Just some notes.\nNothing tabular here.\n'))
+        self.assertEqual(body['display_type'], 'text')
+        self.assertEqual(body['columns'], ['content'])
+
+    def test_txt_doubled_quotes_after_sample(self):
+        # The sniffed sample quotes with ' and has no "", unlike a later row
+        lines = [b"name,note", b"'a',x"] + [b'r%d,plain' % i for i in range(10)] + [b'x,"he said ""hi"", ok"']
+        body = response_json(self.upload('a.txt', b'\n'.join(lines) + b'\n'))
+        self.assertEqual(body['display_type'], 'table')
+        self.assertEqual(body['data'][0], {'name': "'a'", 'note': 'x'})
+        self.assertEqual(body['data'][-1], {'name': 'x', 'note': 'he said "hi", ok'})
+
+    def test_txt_doubled_quotes_after_plain_sample(self):
+        # No quotes at all in the sniffed sample, so csv.Sniffer says doublequote=False
+        lines = [b'name,note'] + [b'r%d,plain' % i for i in range(12)] + [b'x,"he said ""hi"", ok"']
+        body = response_json(self.upload('a.txt', b'\n'.join(lines) + b'\n'))
+        self.assertEqual(body['display_type'], 'table')
+        self.assertEqual(body['row_count'], 13)
+        self.assertEqual(body['data'][-1], {'name': 'x', 'note': 'he said "hi", ok'})
+
+    def test_excel(self):
+        content = io.BytesIO()
+        pd.DataFrame({'name': ['Ann', None], 'n': [1, 2]}).to_excel(content, index=False)
+        body = response_json(self.upload('a.xlsx', content.getvalue()))
+        self.assertEqual(body['columns'], ['name', 'n'])
+        self.assertEqual(body['data'], [{'name': 'Ann', 'n': 1}, {'name': '', 'n': 2}])
+
+    def test_json(self):
+        body = response_json(self.upload('a.json', b'{"name": "Ann", "tags": ["a/b"]}'))
+        self.assertEqual(body['columns'], ['name', 'tags'])
+        self.assertEqual(body['data'], [{'name': 'Ann', 'tags': ['a/b']}])
+
+    def test_json_big_integers_stay_exact(self):
+        content = b'[{"id": 12345678901234567890123, "n": 1.5}]'
+        self.assertEqual(
+            response_json(self.upload('a.json', content))['data'],
+            [{'id': 12345678901234567890123, 'n': 1.5}],
+        )
+
+    def test_dataframe_records_keep_float_precision(self):
+        df = pd.DataFrame({'x': [0.1 + 0.2, 1 / 3, None], 'day': pd.to_datetime(['2024-01-02'] * 3)})
+        self.assertEqual(json.loads(views.dataframe_records_json(df)), [
+            {'x': 0.30000000000000004, 'day': '2024-01-02T00:00:00'},
+            {'x': 0.3333333333333333, 'day': '2024-01-02T00:00:00'},
+            {'x': '', 'day': '2024-01-02T00:00:00'},
+        ])
+
+    @override_settings(MAX_UPLOAD_FILE_SIZE=8)
+    def test_too_large(self):
+        response = self.upload('a.csv', b'a,b\n1,2\n3,4\n')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(response_json(response)['success'])
+
+    @skipIf(views.ijson is None, 'ijson is not installed')
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_streamed_json(self):
+        rows = [{'id': i, 'name': f'row {i}'} for i in range(views.RECORDS_PER_BATCH + 5)]
+        body = response_json(self.upload('a.json', json.dumps(rows).encode()))
+        self.assertEqual(body['row_count'], len(rows))
+        self.assertEqual(body['data'], rows)
+
+        # The C backend rejects integers beyond 64 bits; the upload is parsed whole instead
+        body = response_json(self.upload('a.json', b'[{"id": 12345678901234567890123}]'))
+        self.assertEqual(body['data'], [{'id': 12345678901234567890123}])
+
+
+class ParserTests(TestCase):
+    def test_load_json_keeps_big_integers(self):
+        self.assertEqual(load_json(b'{"a": 18446744073709551616}'), {'a': 18446744073709551616})
+        self.assertEqual(load_json(b'{"a": -9223372036854775809}'), {'a': -9223372036854775809})
+        self.assertEqual(load_json(b'[1.5, 12345678901234567890123.5]'), [1.5, 1.2345678901234568e22])
+
+    def test_load_json_rejects_nan(self):
+        for content in (b'[NaN]', b'[NaN, 18446744073709551616]'):
+            with self.assertRaises(ValueError):
+                load_json(content)
+
+
+class ProcessDataTests(TestCase):
+    def post(self, body):
+        return self.client.post(
+            reverse('process_data'),
+            json.dumps(body),
+            content_type='application/json',
+        )
+
+    def test_big_integers_round_trip(self):
+        body = response_json(self.post({
+            'data': [{'id': 12345678901234567890123, 'c': 'x1'}],
+            'column': 'c',
+            'pattern': r'\d',
+            'replacement': '#',
+        }))
+        self.assertEqual(body['processed_data'], [{'id': 12345678901234567890123, 'c': 'x#'}])
+
+    def test_recovers_from_dead_worker(self):
+        break_cpu_pool()
+        rows = [{'c': f'item {i}'} for i in range(services._POOL_MIN_ROWS * 2)]
+        response = self.post({'data': rows, 'column': 'c', 'pattern': r'\d+', 'replacement': '#'})
+        self.assertEqual(response.status_code, 200)
+        body = response_json(response)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['processed_data'], [{'c': 'item #'}] * len(rows))
+
+    def test_response(self):
+        response = self.post({'data': [{'c': 'a1'}, {'c': 'b'}], 'column': 'c', 'pattern': r'\d', 'replacement': '#'})
+        self.assertEqual(response.status_code, 200)
+        body = response_json(response)
+        self.assertEqual(next(iter(body)), 'success')
+        self.assertEqual(body, {
+            'success': True,
+            'processed_data': [{'c': 'a#'}, {'c': 'b'}],
+            'matches_count': 1,
+            'affected_rows': 1,
+            'affected_columns': ['c'],
+            'total_rows': 2,
+            'pattern': r'\d',
+            'replacement': '#',
+        })
+
+    def test_rejects_non_row_data(self):
+        response = self.post({'data': [1, 2], 'column': 'c', 'pattern': 'a'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response_json(response)['success'])
+
+
+class PrefilterTests(TestCase):
+    def test_literal_text(self):
+        self.assertEqual(literal_text(r'foo\.bar'), 'foo.bar')
+        self.assertIsNone(literal_text(r'a+b'))
+        self.assertIsNone(literal_text(r'(?i)abc'))
+        self.assertIsNone(literal_text('(unclosed'))
+
+    def test_literal_patterns_replace_like_regex(self):
+        rows = [{'c': 'a.b a.b'}, {'c': 'axb'}, {'c': None}]
+        processed, matches, affected_rows, columns = apply_regex_to_rows(rows, 'c', r'a\.b', 'X')
+        self.assertEqual(processed, [{'c': 'X X'}, {'c': 'axb'}, {'c': None}])
+        self.assertEqual((matches, affected_rows, columns), (2, 1, ['c']))
+        # Unchanged rows are passed through, not copied
+        self.assertIs(processed[1], rows[1])
+
+    def test_required_text(self):
+        self.assertEqual(required_text(r'[\w.]+@[\w.]+'), '@')
+        self.assertEqual(required_text(r'(abc)+x'), 'abc')
+        self.assertEqual(required_text(r'(?:foo)?bar'), 'bar')
+        self.assertIsNone(required_text(r'a|b'))
+        self.assertIsNone(required_text(r'(?i)abc'))
+
+    def test_match_values_skips_values_without_required_text(self):
+        values = ['ann@example.com', 'no address', '', 'bob@example.org']
+        self.assertEqual(
+            match_values(values, r'[\w.]+@[\w.]+'),
+            [(0, 'ann@example.com', 0), (3, 'bob@example.org', 0)],
+        )
+        self.assertEqual(
+            match_values(values, r'[\w.]+@[\w.]+', 'X'),
+            [(0, 'X', 1), (3, 'X', 1)],
+        )
+
+
+class ProcessTaskTests(TestCase):
+    def post(self, body):
+        return self.client.post(reverse('process_task'), json.dumps(body), content_type='application/json')
+
+    def test_redacts_matches(self):
+        rows = [{'Email': 'a@b.com', 'Name': 'Ann'}, {'Email': 'none', 'Name': 'Bob'}]
+        with mock.patch.object(views.llm_service, 'openai_api_key', None), \
+                mock.patch.object(views.llm_service, 'hf_api_key', None):
+            response = self.post({
+                'task': "Find email addresses in the Email column and replace them with 'REDACTED'",
+                'data': rows,
+                'columns': ['Email', 'Name'],
+            })
+        body = response_json(response)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['matched_rows'], [0])
+        self.assertEqual(body['processed_data'][1], rows[1])
+        self.assertNotEqual(body['processed_data'][0]['Email'], 'a@b.com')
+
+    def test_rejects_non_row_data(self):
+        response = self.post({'task': 'find x', 'data': ['a'], 'columns': ['value']})
+        self.assertEqual(response.status_code, 400)
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.main_page, name='main_page'),  # New unified main page
     path('convert-to-regex/', views.convert_to_regex, name='convert_to_regex'),
+    path('convert-to-regex-batch/', views.convert_to_regex_batch, name='convert_to_regex_batch'),
     path('test-replacement/', views.test_regex_replacement, name='test_replacement'),
     path('analyze-column/', views.analyze_column, name='analyze_column'),
     path('test-regex-pattern/', views.test_regex_pattern, name='test_regex_pattern'),
@@ -1,9 +1,41 @@
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .services import LLMService
-import json
+from .parsers import has_big_int, load_json
+from .renderers import ORJSONRenderer
+from .services import (
+    LLMService, apply_regex_to_rows_offloaded, compile_regex, match_values_offloaded, validate_replacement
+)
+import asyncio
+import codecs
+import csv
+import importlib.util
+import itertools
+import re
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # CSV/TSV uploads are parsed with pandas alone
+    pacsv = None
+
+try:
+    import ijson
+except ImportError:  # Large JSON uploads are parsed in one go like small ones
+    ijson = None
+
+# pandas loads the reader by engine name; without calamine, fall back to
+# the pure-Python reader, .xlsx only
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# LLMService only holds configuration, so one instance serves every request
+llm_service = LLMService()
 
 
 def main_page(request):
@@ -29,22 +61,10 @@ def convert_to_regex(request):
                 'error': 'Description is required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
         result = llm_service.natural_language_to_regex(description, context, column_data)
 
         if result['success']:
-            response_data = {
-                'success': True,
-                'pattern': result['pattern'],
-                'description': result['description'],
-                'source': result.get('source', 'unknown')
-            }
-
-            # Add explanation if available
-            if 'explanation' in result:
-                response_data['explanation'] = result['explanation']
-
-            return Response(response_data)
+            return Response(_format_regex_result(result))
         else:
             return Response({
                 'success': False,
@@ -57,6 +77,81 @@ def convert_to_regex(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+def convert_to_regex_batch(request):
+    """
+    Convert several natural language descriptions to regex patterns concurrently
+    Expects a list of {description, context, column_data} objects
+    """
+    try:
+        items = request.data
+
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'A non-empty list of items is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        descriptions = [
+            str(item.get('description', '')).strip() if isinstance(item, dict) else ''
+            for item in items
+        ]
+        valid_items = [
+            {
+                'description': description,
+                'context': item.get('context', ''),
+                'column_data': item.get('column_data', None)
+            }
+            for item, description in zip(items, descriptions) if description
+        ]
+
+        batch_results = iter(asyncio.run(llm_service.natural_language_to_regex_batch(valid_items)))
+
+        # Keep results aligned with the request, reporting invalid items in place
+        results = []
+        for description in descriptions:
+            if not description:
+                results.append({
+                    'success': False,
+                    'error': 'Description is required'
+                })
+                continue
+
+            result = next(batch_results)
+            if result['success']:
+                results.append(_format_regex_result(result))
+            else:
+                results.append({
+                    'success': False,
+                    'error': result.get('error', 'Failed to generate regex pattern')
+                })
+
+        return Response({
+            'success': True,
+            'results': results
+        })
+
+    except Exception as e:
+        return Response({
+            'error': f'Server error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _format_regex_result(result):
+    """Build the API representation of a successful regex conversion"""
+    response_data = {
+        'success': True,
+        'pattern': result['pattern'],
+        'description': result['description'],
+        'source': result.get('source', 'unknown')
+    }
+
+    # Add explanation if available
+    if 'explanation' in result:
+        response_data['explanation'] = result['explanation']
+
+    return response_data
+
+
 @api_view(['POST'])
 def analyze_column(request):
     """
@@ -72,7 +167,6 @@ def analyze_column(request):
                 'error': 'Column data is required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
         analysis = llm_service.analyze_column_data(column_data, column_name)
 
         return Response({
@@ -107,7 +201,6 @@ def test_regex_pattern(request):
                 'error': 'Sample data is required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
         test_result = llm_service.test_regex_on_sample(pattern, sample_data, replacement)
 
         return Response(test_result)
@@ -144,7 +237,6 @@ def natural_language_query(request):
                 'error': 'Columns are required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
         query_result = llm_service.natural_language_query(query, dataset, columns)
 
         return Response(query_result)
@@ -172,7 +264,6 @@ def test_regex_replacement(request):
                 'error': 'Pattern and sample_text are required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
         result = llm_service.apply_regex_replacement(sample_text, pattern, replacement)
 
         return Response(result)
@@ -210,41 +301,52 @@ def upload_file(request):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         uploaded_file = request.FILES['file']
+
+        # Check the size before a parser decodes the whole file into memory
+        if uploaded_file.size > settings.MAX_UPLOAD_FILE_SIZE:
+            return Response({
+                'success': False,
+                'error': f'File too large. Maximum size is {settings.MAX_UPLOAD_FILE_SIZE // (1024 * 1024)} MB'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
         file_extension = uploaded_file.name.lower().split('.')[-1]
 
         # Parse file based on extension
         display_type = 'table'  # Default to table display
 
+        # Parsers hand back their rows already serialized to JSON
         if file_extension == 'csv':
-            data, columns = parse_csv_file(uploaded_file)
+            records_json, columns, row_count = parse_csv_file(uploaded_file)
         elif file_extension in ['xlsx', 'xls']:
-            data, columns = parse_excel_file(uploaded_file)
+            records_json, columns, row_count = parse_excel_file(uploaded_file)
         elif file_extension == 'json':
-            data, columns = parse_json_file(uploaded_file)
+            records_json, columns, row_count = parse_json_file(uploaded_file)
         elif file_extension == 'tsv':
-            data, columns = parse_tsv_file(uploaded_file)
+            records_json, columns, row_count = parse_tsv_file(uploaded_file)
         elif file_extension == 'txt':
             result = parse_txt_file(uploaded_file)
-            if len(result) == 3:  # New format with display type
-                data, columns, display_type = result
+            if len(result) == 4:  # New format with display type
+                records_json, columns, row_count, display_type = result
             else:  # Fallback for old format
-                data, columns = result
+                records_json, columns, row_count = result
         elif file_extension == 'xml':
-            data, columns = parse_xml_file(uploaded_file)
+            records_json, columns, row_count = parse_xml_file(uploaded_file)
         else:
             return Response({
                 'success': False,
                 'error': 'Unsupported file format. Supported formats: CSV, Excel, JSON, TSV, TXT, XML'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
-            'success': True,
-            'data': data,
-            'columns': columns,
-            'row_count': len(data),
-            'file_name': uploaded_file.name,
-            'display_type': display_type
-        })
+        # Splice the records into the envelope rather than decoding and
+        # re-encoding them through the renderer
+        body = b'{"success":true,"data":%s,"columns":%s,"row_count":%d,"file_name":%s,"display_type":%s}' % (
+            records_json,
+            dump_json(columns),
+            row_count,
+            dump_json(uploaded_file.name),
+            dump_json(display_type),
+        )
+        return HttpResponse(body, content_type='application/json')
 
     except Exception as e:
         return Response({
@@ -272,6 +374,12 @@ def process_data(request):
                 'error': 'Missing required parameters: data, pattern'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        if not is_row_list(data):
+            return Response({
+                'success': False,
+                'error': 'data must be a list of row objects'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         # Check if specific column or all columns
         if not apply_to_all_columns and not column:
             return Response({
@@ -279,65 +387,19 @@ def process_data(request):
                 'error': 'Either specify a column or set apply_to_all_columns to true'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
-        processed_data = []
-        matches_count = 0
-        affected_rows = 0
-        affected_columns = []
-
-        for row in data:
-            new_row = row.copy()
-            row_modified = False
-
-            if apply_to_all_columns:
-                # Apply to all text columns (requirement behavior)
-                for col_name, col_value in row.items():
-                    if col_value and isinstance(col_value, str):
-                        original_value = str(col_value)
-                        result = llm_service.apply_regex_replacement(original_value, pattern, replacement)
-
-                        if result['success']:
-                            new_row[col_name] = result['result']
-                            if result['result'] != original_value:
-                                row_modified = True
-                                if col_name not in affected_columns:
-                                    affected_columns.append(col_name)
-                                # Count actual replacements
-                                import re
-                                try:
-                                    matches_count += len(re.findall(pattern, original_value))
-                                except re.error:
-                                    # If regex fails, try literal matching
-                                    matches_count += original_value.count(pattern)
-                        else:
-                            # If regex fails, keep original value
-                            new_row[col_name] = original_value
-            else:
-                # Apply to specific column only
-                if column in row and row[column]:
-                    original_value = str(row[column])
-                    result = llm_service.apply_regex_replacement(original_value, pattern, replacement)
-
-                    if result['success']:
-                        new_row[column] = result['result']
-                        if result['result'] != original_value:
-                            row_modified = True
-                            if column not in affected_columns:
-                                affected_columns.append(column)
-                            # Count actual replacements
-                            import re
-                            try:
-                                matches_count += len(re.findall(pattern, original_value))
-                            except re.error:
-                                # If regex fails, try literal matching
-                                matches_count += original_value.count(pattern)
-                    else:
-                        # If regex fails, keep original value
-                        new_row[column] = original_value
-
-            if row_modified:
-                affected_rows += 1
-            processed_data.append(new_row)
+        # Compile once for the whole dataset and reject bad input up front
+        try:
+            compiled_pattern = compile_regex(pattern)
+            validate_replacement(compiled_pattern, replacement)
+        except re.error as e:
+            return Response({
+                'success': False,
+                'error': f'Invalid regex pattern: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        processed_data, matches_count, affected_rows, affected_columns = apply_regex_to_rows_offloaded(
+            data, column, compiled_pattern, replacement, apply_to_all_columns
+        )
 
         return Response({
             'success': True,
@@ -357,32 +419,169 @@ def process_data(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def parse_csv_file(file):
-    """Parse CSV file and return data and columns"""
-    import pandas as pd
-    import io
+def dump_json(value):
+    """Serialize a value to JSON bytes exactly as the API renderer would"""
+    return ORJSONRenderer.dumps(value)
+
+
+def is_row_list(data):
+    """Whether request data is a list of row objects (dicts)"""
+    return isinstance(data, list) and all(isinstance(row, dict) for row in data)
 
-    content = file.read().decode('utf-8')
-    df = pd.read_csv(io.StringIO(content))
 
-    # Convert to list of dictionaries
-    data = df.fillna('').to_dict('records')
-    columns = list(df.columns)
+def records_json(batches):
+    """
+    Serialize batches of rows to one JSON array, a batch at a time, so the
+    rows are never all encoded (or, from a generator, held) at once
+    """
+    # Strip each batch's brackets so the batches join into one array
+    return b'[' + b','.join(dump_json(batch)[1:-1] for batch in batches if batch) + b']'
 
-    return data, columns
 
+def dataframe_records_json(df):
+    """
+    Serialize a DataFrame's rows to a JSON array of objects, one batch of
+    rows at a time so the whole frame is never held as dicts at once.
+    Missing values are shown empty, like fillna(''). pandas' own to_json
+    rounds floats to 15 significant digits, so it is not used.
+    """
+    df = df.fillna('')
+    return records_json(
+        df.iloc[start:start + RECORDS_PER_BATCH].to_dict('records') for start in range(0, len(df), RECORDS_PER_BATCH)
+    )
+
+
+# Enough of an upload to tell UTF-8 from a legacy single-byte encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
 
-def parse_excel_file(file):
-    """Parse Excel file and return data and columns"""
-    import pandas as pd
 
-    df = pd.read_excel(file, engine='openpyxl')
+def sniff_encoding(file):
+    """
+    Guess an upload's text encoding from its first bytes: UTF-8 when they
+    decode cleanly, otherwise Windows-1252, which is what Excel and most
+    Windows tools write. The file is rewound afterwards.
+    """
+    sample = file.read(ENCODING_SNIFF_BYTES)
+    file.seek(0)
+    try:
+        # Unless this is the whole file, a multi-byte character may be cut off at the end
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=len(sample) < ENCODING_SNIFF_BYTES)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+# Rows converted to Python objects at a time when serializing an Arrow table
+RECORDS_PER_BATCH = 10_000
+
+# Cells pandas reads as missing by default; Arrow is given the same list
+PANDAS_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# Integers Arrow's CSV reader keeps exact; wider ones become doubles
+ARROW_INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+# Bytes scanned at a time when looking for integers Arrow would round
+WIDE_INT_SCAN_BYTES = 1024 * 1024
+
+
+def has_wide_integers(file):
+    """
+    Whether delimited bytes hold an integer beyond int64, which Arrow reads
+    as a rounded double while pandas keeps it exact. The file is scanned a
+    block at a time and rewound afterwards.
+    """
+    found = False
+    tail = b''
+    for block in iter(lambda: file.read(WIDE_INT_SCAN_BYTES), b''):
+        if has_big_int(tail + block, ARROW_INT_RANGE):
+            found = True
+            break
+        # Rescan the end of the block so a literal cut at the boundary is seen whole
+        tail = block[-64:]
+    file.seek(0)
+    return found
+
+
+def read_arrow_table(file, sep, encoding, column_types=None):
+    """Read delimited bytes with pyarrow, or None if Arrow rejects the layout"""
+    try:
+        return pacsv.read_csv(
+            file,
+            read_options=pacsv.ReadOptions(encoding=encoding),
+            parse_options=pacsv.ParseOptions(delimiter=sep),
+            convert_options=pacsv.ConvertOptions(
+                column_types=column_types, null_values=PANDAS_NA_VALUES, strings_can_be_null=True
+            ),
+        )
+    except (pa.ArrowInvalid, UnicodeDecodeError):
+        return None
+
+
+def parse_delimited_file(file, sep):
+    """
+    Parse a delimited upload straight from its bytes with Arrow's C++ reader.
+    Falls back to pandas for input Arrow treats differently: ragged rows,
+    duplicate headers (pandas renames them), undecodable bytes, integers
+    beyond int64, or pyarrow not being installed.
+    """
+    encoding = sniff_encoding(file)
+
+    if pacsv is not None and not has_wide_integers(file):
+        table = read_arrow_table(file, sep, encoding)
+
+        # Keep dates and times as the original text, as pandas does
+        temporal_columns = table and [
+            field.name for field in table.schema if pa.types.is_temporal(field.type)
+        ]
+        if temporal_columns:
+            file.seek(0)
+            table = read_arrow_table(
+                file, sep, encoding, {name: pa.string() for name in temporal_columns}
+            )
+
+        # Binary columns mean the bytes were not valid UTF-8
+        if (table is not None and len(set(table.column_names)) == table.num_columns
+                and not any(map(pa.types.is_binary, table.schema.types))):
+            columns = table.column_names
+
+            # Turn one batch of rows at a time into dicts and JSON, so the
+            # whole file is never held as Python objects at once
+            def batches():
+                for batch in table.to_batches(max_chunksize=RECORDS_PER_BATCH):
+                    data = batch.to_pylist()
+
+                    # Missing numeric values come back as None; show them empty like fillna('')
+                    null_columns = [name for name, array in zip(columns, batch.columns) if array.null_count]
+                    if null_columns:
+                        for record in data:
+                            for name in null_columns:
+                                if record[name] is None:
+                                    record[name] = ''
+                    yield data
+
+            return records_json(batches()), columns, table.num_rows
+
+        file.seek(0)
+
+    # Undecodable bytes become U+FFFD instead of failing the whole upload
+    df = pd.read_csv(file, sep=sep, encoding=encoding, encoding_errors='replace')
+
+    return dataframe_records_json(df), list(df.columns), len(df)
+
 
-    # Convert to list of dictionaries
-    data = df.fillna('').to_dict('records')
-    columns = list(df.columns)
+def parse_csv_file(file):
+    """Parse CSV file and return records JSON, columns and row count"""
+    return parse_delimited_file(file, ',')
+
+
+def parse_excel_file(file):
+    """Parse Excel file and return records JSON, columns and row count"""
+    df = pd.read_excel(file, engine=EXCEL_ENGINE)
 
-    return data, columns
+    return dataframe_records_json(df), list(df.columns), len(df)
 
 
 def file_manager_page(request):
@@ -392,12 +591,45 @@ def file_manager_page(request):
     return render(request, 'regex_processor/file_manager.html')
 
 
+def starts_json_array(file):
+    """Whether a JSON upload's top-level value is an array. The file is rewound afterwards."""
+    head = file.read(ENCODING_SNIFF_BYTES)
+    file.seek(0)
+    return head.lstrip().startswith(b'[')
+
+
+def stream_json_array(file):
+    """
+    Re-serialize a top-level JSON array a batch of elements at a time, so
+    a large upload is never held as Python objects all at once
+    """
+    items = ijson.items(file, 'item', use_float=True)
+    columns = []
+    row_count = 0
+
+    def batches():
+        nonlocal columns, row_count
+        while batch := list(itertools.islice(items, RECORDS_PER_BATCH)):
+            if not row_count:
+                columns = list(batch[0].keys()) if isinstance(batch[0], dict) else ['value']
+            row_count += len(batch)
+            yield batch
+
+    records = records_json(batches())
+    return records, columns, row_count
+
+
 def parse_json_file(file):
-    """Parse JSON file and return data and columns"""
-    import json
+    """Parse JSON file and return records JSON, columns and row count"""
+    # Uploads big enough for Django to spool them to disk are streamed
+    if ijson is not None and file.size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE and starts_json_array(file):
+        try:
+            return stream_json_array(file)
+        except ijson.JSONError:  # e.g. integers beyond 64 bits, which the C backend rejects
+            file.seek(0)
 
-    content = file.read().decode('utf-8')
-    json_data = json.loads(content)
+    # orjson parses the raw bytes, no separate decode pass
+    json_data = load_json(file.read())
 
     # Handle different JSON structures
     if isinstance(json_data, list):
@@ -415,119 +647,102 @@ def parse_json_file(file):
         data = [{'value': json_data}]
         columns = ['value']
 
-    return data, columns
+    return dump_json(data), columns, len(data)
 
 
 def parse_tsv_file(file):
-    """Parse TSV file and return data and columns"""
-    import pandas as pd
-    import io
-
-    content = file.read().decode('utf-8')
-    df = pd.read_csv(io.StringIO(content), sep='\t')
-
-    # Convert to list of dictionaries
-    data = df.fillna('').to_dict('records')
-    columns = list(df.columns)
-
-    return data, columns
+    """Parse TSV file and return records JSON, columns and row count"""
+    return parse_delimited_file(file, '\t')
 
 
 def parse_txt_file(file):
-    """Parse TXT file and return data and columns"""
-    import pandas as pd
-    import io
-
-    content = file.read().decode('utf-8')
+    """Parse TXT file and return records JSON, columns and row count"""
+    encoding = sniff_encoding(file)
+    content = file.read().decode(encoding, errors='replace')
 
-    # First check if it looks like structured data (has clear separators)
-    lines = content.strip().split('\n')
+    # First check if it looks like structured data (has clear separators).
+    # Only the first lines are needed for that, so don't split the whole file
+    lines = content.strip().split('\n', 10)
 
     if len(lines) < 2:
         # Single line or empty file, treat as text
         data = [{'content': content}]
         columns = ['content']
-        return data, columns, 'text'
-
-    # Count potential separators in first few lines
-    separator_count = {}
-    for line in lines[:min(10, len(lines))]:  # Check first 10 lines
-        for sep in ['\t', ',', ';', '|']:
-            count = line.count(sep)
-            if count > 0:
-                separator_count[sep] = separator_count.get(sep, 0) + count
-
-    # If we have consistent separators, try to parse as structured data
-    if separator_count:
-        # Find the most common separator
-        best_sep = max(separator_count.keys(), key=lambda k: separator_count[k])
-
-        # Check if the separator appears consistently across multiple lines
-        sep_counts = [line.count(best_sep) for line in lines[:min(10, len(lines))]]
-        consistent_count = sep_counts[0] if sep_counts else 0
-
-        # Must have at least 1 separator per line and be consistent
-        if (consistent_count > 0 and
-            all(count == consistent_count for count in sep_counts[:5]) and  # First 5 lines consistent
-            consistent_count >= 1):  # At least 1 separator (2 columns)
-
-            try:
-                df = pd.read_csv(io.StringIO(content), sep=best_sep)
-                if len(df.columns) > 1 and len(df) > 0:  # Actually structured data with multiple columns
-                    data = df.fillna('').to_dict('records')
-                    columns = list(df.columns)
-                    return data, columns, 'table'
-            except:
-                pass
+        return dump_json(data), columns, len(data), 'text'
+
+    # Let csv.Sniffer pick the separator from the first 10 lines: it only
+    # accepts one that splits the lines consistently, and it understands
+    # quoted fields that contain the separator
+    try:
+        dialect = csv.Sniffer().sniff('\n'.join(lines[:10]), delimiters='\t,;|')
+    except csv.Error:
+        dialect = None
+
+    if dialect is not None:
+        try:
+            # Read like a CSV upload with the sniffed separator. Only the
+            # separator is taken from the dialect: the rest is guessed from
+            # the sample alone (doublequote is False whenever it has no "" in
+            # it) and would misread later rows
+            file.seek(0)
+            records_json, columns, row_count = parse_delimited_file(file, dialect.delimiter)
+            if len(columns) > 1 and row_count > 0:  # Actually structured data with multiple columns
+                return records_json, columns, row_count, 'table'
+        except Exception:
+            pass
 
     # Otherwise, treat as plain text
     # Return the full content as a single text field for text display
     data = [{'content': content}]
     columns = ['content']
-    return data, columns, 'text'
+    return dump_json(data), columns, len(data), 'text'
 
 
 def parse_xml_file(file):
-    """Parse simple XML file and return data and columns"""
-    import xml.etree.ElementTree as ET
-
+    """Parse simple XML file and return records JSON, columns and row count"""
     try:
-        content = file.read().decode('utf-8')
-        root = ET.fromstring(content)
-
-        data = []
-        columns = set()
-
-        # Find all elements with the same tag (assume they are records)
-        children = list(root)
-        if children:
-            # Use the most common child tag as record type
-            tag_counts = {}
-            for child in children:
-                tag_counts[child.tag] = tag_counts.get(child.tag, 0) + 1
-
-            record_tag = max(tag_counts.keys(), key=lambda k: tag_counts[k])
-
-            for element in root.findall(record_tag):
-                record = {}
-                # Get all attributes
-                record.update(element.attrib)
-
-                # Get all child elements
+        # Stream the document: each child of the root becomes a record as
+        # soon as it is complete and is then dropped from the tree, so the
+        # whole document is never held in memory. Records are grouped by tag
+        # to pick the record type afterwards.
+        records_by_tag = {}
+        root = None
+        depth = 0
+        for event, element in ET.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                # Get all attributes, then all child elements
+                record = dict(element.attrib)
                 for child in element:
                     record[child.tag] = child.text or ''
+                records_by_tag.setdefault(element.tag, []).append(record)
+                root.remove(element)
+
+        # Use the most common child tag as record type
+        data = max(records_by_tag.values(), key=len) if records_by_tag else []
 
-                data.append(record)
-                columns.update(record.keys())
+        # Dict as an ordered set: columns keep the order fields first appear in
+        columns = {}
+        for record in data:
+            columns.update(dict.fromkeys(record))
 
         columns = list(columns)
-        return data, columns
+        return dump_json(data), columns, len(data)
 
     except Exception as e:
         # Fallback: return XML structure info
+        file.seek(0)
+        encoding = sniff_encoding(file)
+        content = file.read().decode(encoding, errors='replace')
         data = [{'xml_content': content, 'parse_error': str(e)}]
         columns = ['xml_content', 'parse_error']
-        return data, columns
+        return dump_json(data), columns, len(data)
 
 
 @api_view(['POST'])
@@ -557,7 +772,10 @@ def process_natural_language_task(request):
                 'error': 'Columns are required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        llm_service = LLMService()
+        if not is_row_list(dataset):
+            return Response({
+                'error': 'Data must be a list of row objects'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         # Parse the natural language task to extract pattern, column, and replacement
         task_result = llm_service.parse_natural_language_task(task_description, dataset, columns)
@@ -595,38 +813,14 @@ def process_natural_language_task(request):
         total_replacements = 0
         matched_rows = []
 
-        if replacement_value:
-            # Perform replacement
-            import re
-            for i, row in enumerate(processed_data):
-                original_value = str(row.get(target_column, ''))
-                if original_value:
-                    try:
-                        new_value, count = re.subn(regex_pattern, replacement_value, original_value)
-                        if count > 0:
-                            row[target_column] = new_value
-                            total_replacements += count
-                            matched_rows.append(i)
-                    except re.error:
-                        # If regex fails, try literal matching
-                        if regex_pattern in original_value:
-                            new_value = original_value.replace(regex_pattern, replacement_value)
-                            row[target_column] = new_value
-                            total_replacements += 1
-                            matched_rows.append(i)
-        else:
-            # Just find matches without replacement
-            import re
-            for i, row in enumerate(processed_data):
-                original_value = str(row.get(target_column, ''))
-                if original_value:
-                    try:
-                        if re.search(regex_pattern, original_value):
-                            matched_rows.append(i)
-                    except re.error:
-                        # If regex fails, try literal matching
-                        if regex_pattern in original_value:
-                            matched_rows.append(i)
+        # Only the target column's text goes to the matcher, which runs in
+        # worker processes for large datasets
+        values = [str(row.get(target_column, '')) for row in processed_data]
+        for i, new_value, count in match_values_offloaded(values, regex_pattern, replacement_value):
+            if replacement_value:
+                processed_data[i][target_column] = new_value
+                total_replacements += count
+            matched_rows.append(i)
 
         return Response({
             'success': True,
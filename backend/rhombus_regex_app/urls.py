@@ -11,4 +11,3 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('regex_processor.urls')),
 ]
-1
\ No newline at end of file